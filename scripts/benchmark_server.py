@@ -0,0 +1,430 @@
+import argparse
+import http.client
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPT = os.path.join(script_dir, "server.py")
+RESULTS_DIR = os.path.join(script_dir, ".cache", "benchmarks")
+
+LISTING = json.dumps(
+    {
+        "kind": "Listing",
+        "data": {
+            "after": "t3_bench49",
+            "children": [
+                {
+                    "kind": "t3",
+                    "data": {
+                        "id": f"bench{i}",
+                        "name": f"t3_bench{i}",
+                        "title": f"Benchmark post {i}",
+                        "author": "bench",
+                        "subreddit": "popular",
+                        "permalink": f"/r/popular/comments/bench{i}/",
+                        "url": f"https://example.com/{i}",
+                        "created_utc": 1700000000 + i,
+                        "score": i * 10,
+                        "num_comments": i,
+                        "selftext": "lorem ipsum " * 40,
+                        "all_awardings": [{"name": "unused", "description": "x" * 200}] * 3,
+                    },
+                }
+                for i in range(50)
+            ],
+        },
+    }
+).encode("utf-8")
+
+RSS = (
+    '<?xml version="1.0"?><rss version="2.0"><channel><title>bench</title>'
+    + "".join(
+        f"<item><title>Item {i}</title><link>https://example.com/{i}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 00:00:{i % 60:02d} GMT</pubDate><description>{'text ' * 40}</description></item>"
+        for i in range(40)
+    )
+    + "</channel></rss>"
+).encode("utf-8")
+
+CHALLENGE = b"<html><title>Just a moment...</title><body>Please wait while we check your browser (cf-chl)</body></html>"
+
+SCENARIOS = {
+    "static": {"path": "/assets/app.js", "headers": {"Accept-Encoding": "gzip"}},
+    "proxy": {"path": "/api/reddit/r/popular.json?limit=50"},
+    "proxy-miss": {"path": "/api/reddit/r/popular.json?limit=50", "headers": {"Cache-Control": "no-cache"}},
+    "bridge": {"path": "/api/redlib/r/popular.json?limit=50", "headers": {"Cache-Control": "no-cache"}},
+    "bridge-hedged": {"path": "/api/redlib/r/popular.json?limit=50&fields=all", "headers": {"Cache-Control": "no-cache"}},
+    "fallback": {"path": "/api/redlib/r/popular.json?limit=50", "headers": {"Cache-Control": "no-cache"}},
+    "healthz": {"path": "/api/healthz"},
+}
+
+
+class FakeUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    slow_seconds = 0.3
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path
+        if path.startswith("/slow/"):
+            time.sleep(self.slow_seconds)
+            path = path[len("/slow"):]
+        if path.startswith("/challenge/"):
+            self.send_body(200, CHALLENGE, "text/html; charset=utf-8")
+        elif path.startswith("/allorigins/"):
+            self.send_body(200, json.dumps({"contents": LISTING.decode("utf-8")}).encode("utf-8"), "application/json")
+        elif path.startswith("/good/search/rss") or path.startswith("/good/rss"):
+            self.send_body(200, RSS, "application/rss+xml; charset=utf-8")
+        elif path.startswith("/good/"):
+            self.send_body(200, LISTING, "application/json; charset=utf-8")
+        else:
+            self.send_body(404, b"not found", "text/plain")
+
+
+class FakeUpstreamServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_upstream(slow_seconds):
+    FakeUpstreamHandler.slow_seconds = slow_seconds
+    server = FakeUpstreamServer(("127.0.0.1", 0), FakeUpstreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def build_dist(root):
+    os.makedirs(os.path.join(root, "assets"), exist_ok=True)
+    with open(os.path.join(root, "index.html"), "w") as f:
+        f.write('<!doctype html><html><head><script type="module" src="/assets/app.js"></script></head><body></body></html>')
+    with open(os.path.join(root, "assets", "app.js"), "w") as f:
+        f.write("".join(f"export const value{i} = {i} * Math.random();\n" for i in range(6000)))
+
+
+def scenario_env(name, upstream, dead, dist_dir, port):
+    env = {
+        "SOCIAL_PORTAL_PORT": str(port),
+        "SOCIAL_PORTAL_DIST_DIR": dist_dir,
+        "SOCIAL_PORTAL_DISK_CACHE": "false",
+        "SOCIAL_PORTAL_ENABLE_NITTER_BRIDGE": "true",
+        "SOCIAL_PORTAL_NITTER_PUBLIC": f"{upstream}/challenge,{upstream}/good",
+        "SOCIAL_PORTAL_REDLIB_PUBLIC": f"{upstream}/good,{upstream}/slow/good",
+        "SOCIAL_PORTAL_ALLORIGINS_URL": f"{upstream}/allorigins/get",
+        "SOCIAL_PORTAL_UPSTREAM_HOST_LIMITS": "127.0.0.1=256:0",
+        "SOCIAL_PORTAL_PROXY_TARGETS": ",".join(
+            f"{prefix}={upstream}/good"
+            for prefix in ("/api/reddit", "/api/mastodon", "/api/lemmy", "/api/bluesky")
+        ),
+    }
+    if name == "fallback":
+        env["SOCIAL_PORTAL_REDLIB_PUBLIC"] = f"{dead},{upstream}/challenge"
+    if name == "bridge-hedged":
+        # Every request races both sources; the losing streamed attempt must give back
+        # its pooled connection and limiter slot, or the small host limit runs dry.
+        env["SOCIAL_PORTAL_REDLIB_PUBLIC"] = f"{upstream}/good,{upstream}/good/mirror"
+        env["SOCIAL_PORTAL_STREAMING"] = "true"
+        env["SOCIAL_PORTAL_VALIDATION_PREFIX_BYTES"] = "1024"
+        env["SOCIAL_PORTAL_HEDGE_DELAY_MS"] = "0"
+        env["SOCIAL_PORTAL_UPSTREAM_HOST_LIMITS"] = "127.0.0.1=8:0"
+    return env
+
+
+def start_server(env, extra_env):
+    merged = {**os.environ, **env, **extra_env}
+    process = subprocess.Popen(
+        [sys.executable, "-u", SERVER_SCRIPT],
+        env=merged,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    port = int(env["SOCIAL_PORTAL_PORT"])
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited during startup (code {process.returncode})")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start listening within 15s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class RssSampler:
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_kb = 0
+        self.stop_event = threading.Event()
+
+    def process_ids(self):
+        children_path = f"/proc/{self.pid}/task/{self.pid}/children"
+        try:
+            with open(children_path) as f:
+                return [self.pid] + [int(pid) for pid in f.read().split()]
+        except OSError:
+            return [self.pid]
+
+    def read_kb(self):
+        if os.path.exists(f"/proc/{self.pid}/status"):
+            total = 0
+            for pid in self.process_ids():
+                try:
+                    with open(f"/proc/{pid}/status") as f:
+                        for line in f:
+                            if line.startswith("VmHWM:"):
+                                total += int(line.split()[1])
+                except OSError:
+                    pass
+            return total
+        result = subprocess.run(["ps", "-o", "rss=", "-p", str(self.pid)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False)
+        output = result.stdout.decode("ascii", errors="ignore").strip()
+        return int(output) if output.isdigit() else 0
+
+    def run(self):
+        while not self.stop_event.wait(0.2):
+            self.peak_kb = max(self.peak_kb, self.read_kb())
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.peak_kb = max(self.peak_kb, self.read_kb())
+        return self.peak_kb
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def drive(port, path, headers, total_requests, concurrency, timeout):
+    latencies = []
+    errors = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker():
+        conn = None
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    failed = len(errors) + sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": total_requests,
+        "errors": failed,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "sampleErrors": errors[:3],
+        "seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 1) if wall > 0 else 0,
+        "p50Ms": round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "maxMs": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def upstream_slots_in_flight(port, timeout, settle_seconds=5):
+    # Once the load stops, every upstream limiter slot has to be released again.
+    deadline = time.monotonic() + settle_seconds
+    while True:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        try:
+            conn.request("GET", "/api/healthz")
+            payload = json.loads(conn.getresponse().read())
+        finally:
+            conn.close()
+        in_flight = sum(host.get("inFlight", 0) for host in payload.get("upstreamLimits", {}).values())
+        if in_flight == 0 or time.monotonic() >= deadline:
+            return in_flight
+        time.sleep(0.25)
+
+
+def run_scenario(name, args, upstream, dead, dist_dir):
+    scenario = SCENARIOS[name]
+    port = free_port()
+    extra_env = dict(item.split("=", 1) for item in args.server_env)
+    process = start_server(scenario_env(name, upstream, dead, dist_dir, port), extra_env)
+    sampler = RssSampler(process.pid)
+    sampler.start()
+    try:
+        headers = scenario.get("headers", {})
+        drive(port, scenario["path"], headers, max(args.concurrency, args.warmup), args.concurrency, args.timeout)
+        result = drive(port, scenario["path"], headers, args.requests, args.concurrency, args.timeout)
+        result["leakedSlots"] = upstream_slots_in_flight(port, args.timeout)
+    finally:
+        result_rss = sampler.stop()
+        stop_server(process)
+    result["peakRssMb"] = round(result_rss / 1024, 1) if result_rss else None
+    return result
+
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=script_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False)
+    except OSError:
+        return None
+    return result.stdout.decode("ascii").strip() or None
+
+
+def latest_result_file(results_dir):
+    if not os.path.isdir(results_dir):
+        return None
+    files = sorted(name for name in os.listdir(results_dir) if name.startswith("benchmark-") and name.endswith(".json"))
+    return os.path.join(results_dir, files[-1]) if files else None
+
+
+def format_delta(current, previous, lower_is_better):
+    if current is None or not previous:
+        return ""
+    change = (current - previous) / previous * 100
+    worse = change > 0 if lower_is_better else change < 0
+    return f" ({change:+.0f}%{'!' if worse and abs(change) >= 10 else ''})"
+
+
+def print_report(results, baseline):
+    previous = (baseline or {}).get("scenarios", {})
+    print(f"\n{'scenario':<12} {'req/s':>14} {'p50 ms':>14} {'p99 ms':>14} {'peak RSS MB':>16} {'errors':>7}")
+    for name, result in results.items():
+        before = previous.get(name, {})
+        rps = f"{result['rps']}{format_delta(result['rps'], before.get('rps'), False)}"
+        p50 = f"{result['p50Ms']}{format_delta(result['p50Ms'], before.get('p50Ms'), True)}"
+        p99 = f"{result['p99Ms']}{format_delta(result['p99Ms'], before.get('p99Ms'), True)}"
+        rss = f"{result['peakRssMb']}{format_delta(result['peakRssMb'], before.get('peakRssMb'), True)}"
+        print(f"{name:<12} {rps:>14} {p50:>14} {p99:>14} {rss:>16} {result['errors']:>7}")
+    leaks = {name: result["leakedSlots"] for name, result in results.items() if result.get("leakedSlots")}
+    for name, count in leaks.items():
+        print(f"LEAK: {name} left {count} upstream limiter slot(s) in flight after the run")
+    if baseline:
+        print(f"\nCompared with {baseline.get('timestamp')} ({baseline.get('revision') or 'unknown revision'}); '!' marks a 10%+ regression.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scripts/server.py against local stand-in upstreams.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--slow-ms", type=int, default=300, help="latency of the slow upstream instance")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE", help="extra environment for the server under test")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--baseline", help="results file to compare against (default: newest file in --results-dir)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if any("=" not in item for item in args.server_env):
+        parser.error("--server-env expects KEY=VALUE")
+
+    baseline_path = args.baseline or latest_result_file(args.results_dir)
+    baseline = None
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    upstream_server, upstream = start_fake_upstream(args.slow_ms / 1000)
+    dead = f"http://127.0.0.1:{free_port()}"
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="social-portal-bench-") as dist_dir:
+        build_dist(dist_dir)
+        for name in names:
+            print(f"Running {name}: {args.requests} requests, concurrency {args.concurrency}...")
+            results[name] = run_scenario(name, args, upstream, dead, dist_dir)
+    upstream_server.shutdown()
+
+    print_report(results, baseline)
+    leaked = any(result.get("leakedSlots") for result in results.values())
+    if args.no_save:
+        sys.exit(1 if leaked else 0)
+    os.makedirs(args.results_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    payload = {
+        "timestamp": timestamp,
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "concurrency": args.concurrency,
+        "requestsPerScenario": args.requests,
+        "serverEnv": args.server_env,
+        "scenarios": results,
+    }
+    output_path = os.path.join(args.results_dir, f"benchmark-{timestamp}.json")
+    with open(output_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Saved results to {output_path}")
+    if leaked:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,27 @@
+import argparse
+import email.utils
+import hashlib
 import http.server
-import socketserver
-import socket
+import json
 import os
+import shutil
+import socket
 import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from collections import OrderedDict
 
 PORT = 9999
 FILE = "social-portal-portable.zip"
+CHUNK_BYTES = 1024 * 1024
+DELTA_INFO = ".social-portal-delta.json"
+DELTA_MAX_REQUEST_BYTES = 8 * 1024 * 1024
+DELTA_CACHE_ENTRIES = 8
+LOCAL_FILES = ("scripts/server.py", "scripts/serve-update.py")
+
 
 def get_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -19,27 +35,377 @@ def get_ip():
         s.close()
     return IP
 
-# Ensure builds exists
-if not os.path.exists(FILE):
-    print(f"Error: {FILE} not found!")
-    print("Please run 'npm run build:portable' first.")
-    sys.exit(1)
 
-IP = get_ip()
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UpdateBundle:
+    # The zip, its checksum and the per-file manifest of its contents. Everything is
+    # recomputed when the zip changes on disk, so a rebuild is picked up without a restart.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.size = 0
+        self.sha256 = None
+        self.etag = None
+        self.last_modified = None
+        self.manifest = {}
+        self.version = None
+        self.delta_lock = threading.Lock()
+        self.deltas = OrderedDict()
+        self.delta_dir = tempfile.mkdtemp(prefix="social-portal-delta-")
+
+    def current(self):
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if stamp != self.stamp:
+                self.load(stat)
+                self.stamp = stamp
+            return self
+
+    def load(self, stat):
+        self.size = stat.st_size
+        self.sha256 = sha256_file(self.path)
+        self.etag = f'"{self.sha256}"'
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        manifest = {}
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as f:
+                    digest = hashlib.sha256()
+                    for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                        digest.update(chunk)
+                manifest[info.filename] = {"sha256": digest.hexdigest(), "size": info.file_size}
+        self.manifest = manifest
+        self.drop_deltas()
+        self.version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        print(f"[update] {self.path}: {self.size} bytes, sha256 {self.sha256}, {len(manifest)} files (build {self.version})")
+
+    def drop_deltas(self):
+        with self.delta_lock:
+            while self.deltas:
+                self.evict_delta_locked()
+
+    def evict_delta_locked(self):
+        _, entry = self.deltas.popitem(last=False)
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
+
+    def delta(self, installed):
+        # Deltas are built once per (build, changed set) into a temp file and served from
+        # there, so concurrent pulls neither rebuild nor hold whole zips in memory.
+        # Returns an open file; the caller closes it.
+        version, manifest = self.version, self.manifest
+        changed = sorted(name for name, entry in manifest.items() if installed.get(name) != entry["sha256"])
+        removed = sorted(name for name in installed if name.startswith("dist/") and name not in manifest)
+        key = hashlib.sha256(json.dumps([version, changed, removed]).encode("utf-8")).hexdigest()[:16]
+        with self.delta_lock:
+            entry = self.deltas.get(key)
+            if entry is None:
+                entry = self.build_delta(key, version, changed, removed, {name: manifest[name]["sha256"] for name in changed})
+                self.deltas[key] = entry
+                while len(self.deltas) > DELTA_CACHE_ENTRIES:
+                    self.evict_delta_locked()
+            else:
+                self.deltas.move_to_end(key)
+            return open(entry["path"], "rb"), entry
+
+    def build_delta(self, key, version, changed, removed, checksums):
+        path = os.path.join(self.delta_dir, f"{key}.zip")
+        with zipfile.ZipFile(self.path) as source, zipfile.ZipFile(path + ".part", "w", zipfile.ZIP_DEFLATED) as archive:
+            for name in changed:
+                info = source.getinfo(name)
+                target = zipfile.ZipInfo(name, date_time=info.date_time)
+                target.external_attr = info.external_attr
+                target.compress_type = zipfile.ZIP_DEFLATED
+                target.file_size = info.file_size
+                with source.open(info) as src, archive.open(target, "w") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_BYTES)
+            archive.writestr(DELTA_INFO, json.dumps({"version": version, "changed": changed, "removed": removed, "sha256": checksums}))
+        os.replace(path + ".part", path)
+        return {"path": path, "size": os.path.getsize(path), "sha256": sha256_file(path), "version": version, "changed": len(changed), "removed": len(removed)}
 
-print("\n--- Termux Deployment Helper ---")
-print("On your computer, this script is hosting the update file.")
-print("On your Android phone (Termux), run this ONE command to download, unzip, and start:")
-print(f"\nExample Command (use your Tailscale IP if on VPN):\n")
-print(f"curl -L http://{IP}:{PORT}/{FILE} -o portal.zip && unzip -o portal.zip && python3 scripts/server.py")
-print(f"\nServing on 0.0.0.0:{PORT} (Press Ctrl+C to stop)...")
+    def cleanup(self):
+        self.drop_deltas()
+        shutil.rmtree(self.delta_dir, ignore_errors=True)
+
+
+def parse_range(header, size):
+    # Single byte ranges only; anything else is answered with the full file, as RFC 9110 allows.
+    unit, _, spec = (header or "").partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0:
+                return "unsatisfiable"
+            return max(0, size - length), size - 1
+        first = int(start)
+        last = int(end) if end else None
+    except ValueError:
+        return None
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        return "unsatisfiable"
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+class UpdateHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = 60
+    bundle = None
 
-class Handler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=".", **kwargs)
 
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    def do_GET(self):
+        self.route(head_only=False)
+
+    def do_HEAD(self):
+        self.route(head_only=True)
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/delta":
+            self.send_error(404)
+            return
+        self.send_delta()
+
+    def route(self, head_only):
+        path = self.path.split("?", 1)[0]
+        if path == f"/{FILE}":
+            self.send_bundle(head_only)
+        elif path == f"/{FILE}.sha256":
+            bundle = self.bundle.current()
+            self.send_bytes(f"{bundle.sha256}  {FILE}\n".encode("ascii"), "text/plain; charset=utf-8", head_only, bundle.etag)
+        elif path == "/manifest.json":
+            bundle = self.bundle.current()
+            body = json.dumps({"version": bundle.version, "sha256": bundle.sha256, "files": bundle.manifest}, indent=2).encode("utf-8")
+            self.send_bytes(body, "application/json; charset=utf-8", head_only, bundle.etag)
+        elif head_only:
+            super().do_HEAD()
+        else:
+            super().do_GET()
+
+    def send_bytes(self, body, content_type, head_only, etag=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def range_applies(self, bundle):
+        if_range = self.headers.get("If-Range")
+        return if_range is None or if_range.strip() in (bundle.etag, bundle.last_modified)
+
+    def send_bundle(self, head_only):
+        bundle = self.bundle.current()
+        if self.headers.get("If-None-Match") == bundle.etag:
+            self.send_response(304)
+            self.send_header("ETag", bundle.etag)
+            self.end_headers()
+            return
+        byte_range = parse_range(self.headers.get("Range"), bundle.size) if "Range" in self.headers and self.range_applies(bundle) else None
+        if byte_range == "unsatisfiable":
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{bundle.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = byte_range or (0, bundle.size - 1)
+        length = max(0, end - start + 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", bundle.etag)
+        self.send_header("Last-Modified", bundle.last_modified)
+        self.send_header("X-Checksum-SHA256", bundle.sha256)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{bundle.size}")
+        self.end_headers()
+        if head_only or length == 0:
+            return
+        with open(bundle.path, "rb") as f:
+            # socket.sendfile uses os.sendfile where the platform has it and falls back to send().
+            self.connection.sendfile(f, start, length)
+
+    def send_delta(self):
+        bundle = self.bundle.current()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.send_error(400, "invalid Content-Length")
+            return
+        if length <= 0 or length > DELTA_MAX_REQUEST_BYTES:
+            self.send_error(413 if length > 0 else 411)
+            return
+        try:
+            installed = json.loads(self.rfile.read(length)).get("files", {})
+            if not isinstance(installed, dict):
+                raise ValueError("files must be an object")
+        except (ValueError, AttributeError) as e:
+            self.send_error(400, f"invalid manifest: {e}")
+            return
+        delta_file, entry = bundle.delta(installed)
+        with delta_file:
+            print(f"[update] delta for {self.client_address[0]}: {entry['changed']} changed, {entry['removed']} removed, {entry['size']} bytes")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Length", str(entry["size"]))
+            self.send_header("X-Update-Version", entry["version"])
+            self.send_header("X-Checksum-SHA256", entry["sha256"])
+            self.end_headers()
+            self.connection.sendfile(delta_file, 0, entry["size"])
+
+
+class UpdateServer(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def local_manifest(root):
+    files = {}
+    for base, _, names in os.walk(os.path.join(root, "dist")):
+        for name in names:
+            path = os.path.join(base, name)
+            files[os.path.relpath(path, root).replace(os.sep, "/")] = sha256_file(path)
+    for name in LOCAL_FILES:
+        path = os.path.join(root, name)
+        if os.path.isfile(path):
+            files[name] = sha256_file(path)
+    return files
+
+
+def safe_target(root, name):
+    target = os.path.realpath(os.path.join(root, name))
+    if os.path.isabs(name) or not target.startswith(os.path.realpath(root) + os.sep):
+        raise ValueError(f"refusing to write outside {root}: {name}")
+    return target
+
+
+def pull_delta(base_url, root):
+    installed = local_manifest(root)
+    request = urllib.request.Request(
+        base_url.rstrip("/") + "/delta",
+        data=json.dumps({"files": installed}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    fd, delta_path = tempfile.mkstemp(prefix=".social-portal-delta-", suffix=".zip", dir=root)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    expected = (response.headers.get("X-Checksum-SHA256") or "").strip().lower()
+                    digest = hashlib.sha256()
+                    transferred = 0
+                    for chunk in iter(lambda: response.read(CHUNK_BYTES), b""):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        transferred += len(chunk)
+            except OSError as e:
+                return delta_failed(base_url, e)
+        if not expected or digest.hexdigest() != expected:
+            return delta_failed(base_url, f"checksum mismatch (got {digest.hexdigest()}, published {expected or 'none'})")
+        with zipfile.ZipFile(delta_path) as archive:
+            info = json.loads(archive.read(DELTA_INFO))
+            staged = []
+            try:
+                for name in info["changed"]:
+                    target = safe_target(root, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    digest = hashlib.sha256()
+                    with archive.open(name) as src, open(target + ".part", "wb") as dst:
+                        staged.append(target)
+                        for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+                            digest.update(chunk)
+                            dst.write(chunk)
+                    if digest.hexdigest() != info["sha256"][name]:
+                        raise ValueError(f"checksum mismatch for {name}")
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                for target in staged:
+                    remove_quietly(target + ".part")
+                return delta_failed(base_url, e)
+        for target in staged:
+            os.replace(target + ".part", target)
+        for name in info["removed"]:
+            target = safe_target(root, name)
+            if os.path.isfile(target):
+                os.remove(target)
+    finally:
+        remove_quietly(delta_path)
+    print(f"Updated to build {info['version']}: {len(info['changed'])} changed, {len(info['removed'])} removed ({transferred} bytes transferred)")
+    return 0
+
+
+def delta_failed(base_url, error):
+    print(f"Delta update failed: {error}")
+    print(f"Fall back to the full download: curl -L -C - {base_url.rstrip('/')}/{FILE} -o portal.zip && unzip -o portal.zip")
+    return 1
+
+
+def remove_quietly(path):
     try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\nStopped.")
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def serve(port):
+    # Ensure builds exists
+    if not os.path.exists(FILE):
+        print(f"Error: {FILE} not found!")
+        print("Please run 'npm run build:portable' first.")
+        sys.exit(1)
+
+    UpdateHandler.bundle = UpdateBundle(FILE)
+    bundle = UpdateHandler.bundle.current()
+    IP = get_ip()
+    url = f"http://{IP}:{port}"
+
+    print("\n--- Termux Deployment Helper ---")
+    print("On your computer, this script is hosting the update file.")
+    print("On your Android phone (Termux), run this ONE command to download, unzip, and start:")
+    print("\nExample Command (use your Tailscale IP if on VPN):\n")
+    print(f"curl -L -C - {url}/{FILE} -o portal.zip && unzip -o portal.zip && python3 scripts/server.py")
+    print("\nAn interrupted download resumes from where it stopped when the command is re-run (-C -).")
+    print(f"Verify it with: curl -s {url}/{FILE}.sha256 | sed 's/{FILE}/portal.zip/' | sha256sum -c")
+    print("\nTo update an existing install with only the changed files:\n")
+    print(f"python3 scripts/serve-update.py --pull {url} && python3 scripts/server.py")
+    print(f"\nServing build {bundle.version} on 0.0.0.0:{port} (Press Ctrl+C to stop)...")
+
+    with UpdateServer(("", port), UpdateHandler) as httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        finally:
+            UpdateHandler.bundle.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve social-portal-portable.zip to phones on the LAN, or pull an update from such a server.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--pull", metavar="URL", help="update the install in --dir from a running update server instead of serving")
+    parser.add_argument("--dir", default=".", help="install directory for --pull (the folder containing dist/ and scripts/)")
+    args = parser.parse_args()
+    if args.pull:
+        sys.exit(pull_delta(args.pull, args.dir))
+    serve(args.port)
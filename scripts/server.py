@@ -1,21 +1,83 @@
+import base64
+import email.utils
+import gzip
+import hashlib
+import html
+import http.client
 import http.server
+import io
 import json
+import math
+import mimetypes
 import os
+import queue
 import random
+import re
+import select
+import signal
 import socket
-import socketserver
+import sqlite3
 import ssl
-import subprocess
+import sys
+import threading
+import time
 import urllib.error
 import urllib.request
-from urllib.parse import parse_qs, quote, urljoin, urlparse
+import xml.etree.ElementTree as ElementTree
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, parse_qsl, quote, unquote, urlencode, urljoin, urlparse, urlunparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 PORT = int(os.getenv("SOCIAL_PORTAL_PORT", "8090"))
 REQUEST_TIMEOUT_SECONDS = int(os.getenv("SOCIAL_PORTAL_REQUEST_TIMEOUT_SECONDS", "6"))
 HEALTH_PROBE_TIMEOUT_SECONDS = int(os.getenv("SOCIAL_PORTAL_HEALTH_TIMEOUT_SECONDS", "4"))
 MAX_DIRECT_SOURCE_ATTEMPTS = int(os.getenv("SOCIAL_PORTAL_MAX_SOURCE_ATTEMPTS", "4"))
 MAX_PROXY_FALLBACK_ATTEMPTS = int(os.getenv("SOCIAL_PORTAL_MAX_PROXY_FALLBACK_ATTEMPTS", "2"))
-JINA_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64)"
+HEDGE_DELAY_MS = int(os.getenv("SOCIAL_PORTAL_HEDGE_DELAY_MS", "800"))
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("SOCIAL_PORTAL_HEDGE_MAX_IN_FLIGHT", "2"))
+SOURCE_FAILURE_THRESHOLD = int(os.getenv("SOCIAL_PORTAL_SOURCE_FAILURE_THRESHOLD", "3"))
+SOURCE_COOLDOWN_SECONDS = int(os.getenv("SOCIAL_PORTAL_SOURCE_COOLDOWN_SECONDS", "30"))
+SOURCE_MAX_COOLDOWN_SECONDS = int(os.getenv("SOCIAL_PORTAL_SOURCE_MAX_COOLDOWN_SECONDS", "900"))
+SOURCE_EWMA_ALPHA = 0.3
+SOURCE_LATENCY_SAMPLES = 64
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("SOCIAL_PORTAL_ADAPTIVE_TIMEOUT_FACTOR", "3"))
+ADAPTIVE_TIMEOUT_FLOOR_MS = int(os.getenv("SOCIAL_PORTAL_ADAPTIVE_TIMEOUT_FLOOR_MS", "300"))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 8
+BRIDGE_DEADLINE_MS = int(os.getenv("SOCIAL_PORTAL_BRIDGE_DEADLINE_MS", "12000"))
+BRIDGE_DIRECT_SHARE = float(os.getenv("SOCIAL_PORTAL_BRIDGE_DIRECT_SHARE", "0.7"))
+HEALTH_INTERVAL_SECONDS = int(os.getenv("SOCIAL_PORTAL_HEALTH_INTERVAL_SECONDS", "60"))
+HEALTH_PROBE_CONCURRENCY = int(os.getenv("SOCIAL_PORTAL_HEALTH_PROBE_CONCURRENCY", "4"))
+HEALTH_INTERVAL_JITTER = 0.2
+HEALTH_IDLE_SECONDS = int(os.getenv("SOCIAL_PORTAL_HEALTH_IDLE_SECONDS", "600"))
+CACHE_MAX_BYTES = int(os.getenv("SOCIAL_PORTAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_STALE_SECONDS = int(os.getenv("SOCIAL_PORTAL_CACHE_STALE_SECONDS", "300"))
+CONDITIONAL_MAX_BYTES = int(os.getenv("SOCIAL_PORTAL_CONDITIONAL_MAX_BYTES", str(16 * 1024 * 1024)))
+COMPRESSION_MIN_BYTES = int(os.getenv("SOCIAL_PORTAL_COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("SOCIAL_PORTAL_COMPRESSION_LEVEL", "5"))
+STREAM_CHUNK_BYTES = int(os.getenv("SOCIAL_PORTAL_STREAM_CHUNK_BYTES", str(64 * 1024)))
+VALIDATION_PREFIX_BYTES = int(os.getenv("SOCIAL_PORTAL_VALIDATION_PREFIX_BYTES", str(32 * 1024)))
+SENDFILE_MIN_BYTES = int(os.getenv("SOCIAL_PORTAL_SENDFILE_MIN_BYTES", str(64 * 1024)))
+DISK_CACHE_MAX_BYTES = int(os.getenv("SOCIAL_PORTAL_DISK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DISK_CACHE_MAX_AGE_SECONDS = int(os.getenv("SOCIAL_PORTAL_DISK_CACHE_MAX_AGE_SECONDS", "86400"))
+JINA_USER_AGENT = os.getenv("SOCIAL_PORTAL_JINA_USER_AGENT", "Mozilla/5.0 (X11; Linux x86_64)")
+JINA_TIMEOUT_SECONDS = int(os.getenv("SOCIAL_PORTAL_JINA_TIMEOUT_SECONDS", str(max(REQUEST_TIMEOUT_SECONDS, 20))))
+JINA_TLS_CIPHERS = os.getenv("SOCIAL_PORTAL_JINA_TLS_CIPHERS", "").strip()
+SERVER_MODE = os.getenv("SOCIAL_PORTAL_SERVER_MODE", "pool").strip().lower()
+SERVER_WORKERS = int(os.getenv("SOCIAL_PORTAL_SERVER_WORKERS", "16"))
+SERVER_PROCESSES = int(os.getenv("SOCIAL_PORTAL_PROCESSES", "1"))
+SUPERVISOR_MAX_BACKOFF_SECONDS = 30
+SHARED_SYNC_SECONDS = 1.0
+SERVER_ACCEPT_QUEUE = int(os.getenv("SOCIAL_PORTAL_ACCEPT_QUEUE", "64"))
+SHUTDOWN_GRACE_SECONDS = int(os.getenv("SOCIAL_PORTAL_SHUTDOWN_GRACE_SECONDS", "10"))
+KEEPALIVE_IDLE_SECONDS = int(os.getenv("SOCIAL_PORTAL_KEEPALIVE_IDLE_SECONDS", "5"))
+KEEPALIVE_POLL_SECONDS = 0.1
+KEEPALIVE_MAX_REQUESTS = int(os.getenv("SOCIAL_PORTAL_KEEPALIVE_MAX_REQUESTS", "100"))
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 DIST_DIR = None
@@ -23,6 +85,8 @@ possible_paths = [
     os.path.join(script_dir, "dist"),
     os.path.join(os.path.dirname(script_dir), "dist"),
 ]
+if os.getenv("SOCIAL_PORTAL_DIST_DIR"):
+    possible_paths.insert(0, os.path.abspath(os.getenv("SOCIAL_PORTAL_DIST_DIR")))
 
 for p in possible_paths:
     if os.path.exists(p) and os.path.isdir(p):
@@ -32,6 +96,10 @@ for p in possible_paths:
 if not DIST_DIR:
     DIST_DIR = possible_paths[0]
 
+DISK_CACHE_PATH = os.getenv("SOCIAL_PORTAL_DISK_CACHE_PATH", os.path.join(script_dir, ".cache", "feed-cache.sqlite3"))
+SHARED_STATE_PATH = os.getenv("SOCIAL_PORTAL_SHARED_STATE_PATH", os.path.join(script_dir, ".cache", "shared-state.sqlite3"))
+WORKER_INDEX = None
+
 PROXIES = {
     "/api/reddit": "https://www.reddit.com",
     "/api/mastodon": "https://mastodon.social",
@@ -95,6 +163,53 @@ def normalize_source(value):
     return cleaned.rstrip("/")
 
 
+def parse_ttl_env(name, default_values):
+    ttls = dict(default_values)
+    raw = os.getenv(name)
+    if not raw:
+        return ttls
+    for item in raw.split(","):
+        prefix, _, seconds = item.partition("=")
+        prefix = prefix.strip()
+        if not prefix or not seconds.strip():
+            continue
+        try:
+            ttls[prefix] = int(seconds)
+        except ValueError:
+            print(f"Ignoring invalid entry in {name}: {item.strip()}")
+    return ttls
+
+
+def parse_proxy_targets_env(name, default_values):
+    targets = dict(default_values)
+    raw = os.getenv(name)
+    if not raw:
+        return targets
+    for item in raw.split(","):
+        prefix, _, target = item.partition("=")
+        prefix = prefix.strip()
+        if prefix not in targets or not normalize_source(target):
+            print(f"Ignoring invalid proxy target entry in {name}: {item.strip()}")
+            continue
+        targets[prefix] = normalize_source(target)
+    return targets
+
+
+def parse_host_limits_env(name, default_values):
+    limits = dict(default_values)
+    raw = os.getenv(name)
+    if not raw:
+        return limits
+    for item in raw.split(","):
+        host, _, spec = item.partition("=")
+        in_flight, _, rate = spec.partition(":")
+        try:
+            limits[host.strip().lower()] = (int(in_flight), float(rate or 0))
+        except ValueError:
+            print(f"Ignoring invalid upstream limit entry in {name}: {item.strip()}")
+    return limits
+
+
 def parse_source_list_env(name, default_values):
     raw = os.getenv(name)
     values = default_values
@@ -108,6 +223,43 @@ def parse_source_list_env(name, default_values):
     return normalized
 
 
+HEDGED_FETCH_ENABLED = parse_bool_env("SOCIAL_PORTAL_HEDGED_FETCH", True)
+CACHE_ENABLED = parse_bool_env("SOCIAL_PORTAL_CACHE", True)
+SINGLE_FLIGHT_ENABLED = parse_bool_env("SOCIAL_PORTAL_SINGLE_FLIGHT", True)
+DISK_CACHE_ENABLED = parse_bool_env("SOCIAL_PORTAL_DISK_CACHE", SERVER_PROCESSES > 1)
+CONDITIONAL_REQUESTS_ENABLED = parse_bool_env("SOCIAL_PORTAL_CONDITIONAL_REQUESTS", True)
+COMPRESSION_ENABLED = parse_bool_env("SOCIAL_PORTAL_COMPRESSION", True)
+STATIC_INDEX_ENABLED = parse_bool_env("SOCIAL_PORTAL_STATIC_INDEX", True)
+STREAMING_ENABLED = parse_bool_env("SOCIAL_PORTAL_STREAMING", False)
+PROJECTION_ENABLED = parse_bool_env("SOCIAL_PORTAL_PROJECTION", True)
+HEALTH_MONITOR_ENABLED = parse_bool_env("SOCIAL_PORTAL_HEALTH_MONITOR", True)
+METRICS_ENABLED = parse_bool_env("SOCIAL_PORTAL_METRICS", True)
+ADAPTIVE_TIMEOUTS_ENABLED = parse_bool_env("SOCIAL_PORTAL_ADAPTIVE_TIMEOUTS", True)
+PREFETCH_ENABLED = parse_bool_env("SOCIAL_PORTAL_PREFETCH", True)
+SERVER_TIMING_ENABLED = parse_bool_env("SOCIAL_PORTAL_SERVER_TIMING", True)
+JINA_ALPN_ENABLED = parse_bool_env("SOCIAL_PORTAL_JINA_ALPN", True)
+STATIC_PRECOMPRESS = parse_bool_env("SOCIAL_PORTAL_STATIC_PRECOMPRESS", True)
+REUSE_PORT_ENABLED = parse_bool_env("SOCIAL_PORTAL_REUSE_PORT", True) and hasattr(socket, "SO_REUSEPORT")
+MULTIPROCESS_ENABLED = SERVER_PROCESSES > 1 and hasattr(os, "fork")
+CACHE_TTLS = parse_ttl_env(
+    "SOCIAL_PORTAL_CACHE_TTLS",
+    {
+        "/api/reddit": 60,
+        "/api/mastodon": 60,
+        "/api/nostr": 120,
+        "/api/lemmy": 60,
+        "/api/custom-feed": 60,
+        "/api/misskey": 60,
+        "/api/misskey-design": 60,
+        "/api/bluesky": 30,
+        "/api/nitter": 120,
+        "/api/redlib": 60,
+        "/api/proxy": 300,
+        "/api/jina": 1800,
+    },
+)
+PROXIES = parse_proxy_targets_env("SOCIAL_PORTAL_PROXY_TARGETS", PROXIES)
+ALLORIGINS_URL = os.getenv("SOCIAL_PORTAL_ALLORIGINS_URL", "https://api.allorigins.win/get")
 NITTER_ENABLED = parse_bool_env("SOCIAL_PORTAL_ENABLE_NITTER_BRIDGE", False)
 REDLIB_ENABLED = parse_bool_env("SOCIAL_PORTAL_ENABLE_REDLIB_BRIDGE", True)
 
@@ -129,7 +281,275 @@ NITTER_CHALLENGE_MARKERS = (
 )
 
 REDLIB_CHALLENGE_MARKERS = NITTER_CHALLENGE_MARKERS
+REDLIB_LISTING_KIND = re.compile(r'"kind"\s*:\s*"Listing"')
+REDLIB_LISTING_CHILDREN = re.compile(r'"children"\s*:\s*\[')
 HOP_BY_HOP_HEADERS = {"transfer-encoding", "content-encoding", "content-length", "connection"}
+UNCACHEABLE_HEADERS = {"transfer-encoding", "content-length", "connection", "set-cookie", "age", "date"}
+UPSTREAM_ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+COMPRESSIBLE_TYPES = ("text/", "json", "xml", "javascript", "svg")
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_UPSTREAM_REDIRECTS = 10
+
+UPSTREAM_POOL_ENABLED = parse_bool_env("SOCIAL_PORTAL_UPSTREAM_POOL", True)
+UPSTREAM_POOL_MAX_PER_HOST = int(os.getenv("SOCIAL_PORTAL_UPSTREAM_POOL_MAX_PER_HOST", "4"))
+UPSTREAM_POOL_IDLE_SECONDS = int(os.getenv("SOCIAL_PORTAL_UPSTREAM_POOL_IDLE_SECONDS", "30"))
+
+UPSTREAM_LIMITS_ENABLED = parse_bool_env("SOCIAL_PORTAL_UPSTREAM_LIMITS", True)
+UPSTREAM_MAX_IN_FLIGHT = int(os.getenv("SOCIAL_PORTAL_UPSTREAM_MAX_IN_FLIGHT", "8"))
+UPSTREAM_RATE_PER_SECOND = float(os.getenv("SOCIAL_PORTAL_UPSTREAM_RATE", "20"))
+UPSTREAM_QUEUE_SIZE = int(os.getenv("SOCIAL_PORTAL_UPSTREAM_QUEUE", "32"))
+UPSTREAM_QUEUE_TIMEOUT_MS = int(os.getenv("SOCIAL_PORTAL_UPSTREAM_QUEUE_TIMEOUT_MS", "2000"))
+UPSTREAM_HOST_LIMITS = parse_host_limits_env(
+    "SOCIAL_PORTAL_UPSTREAM_HOST_LIMITS",
+    {
+        "www.reddit.com": (4, 2.0),
+        "api.allorigins.win": (2, 1.0),
+        "r.jina.ai": (2, 1.0),
+    },
+)
+
+
+def parse_feed_targets_env(name, default_values):
+    targets = {key: list(values) for key, values in default_values.items()}
+    raw = os.getenv(name)
+    if not raw:
+        return targets
+    for item in raw.split(","):
+        network, _, urls = item.partition("=")
+        network = network.strip().lower()
+        if not network:
+            continue
+        targets[network] = [url.strip() for url in urls.split("|") if url.strip()]
+    return targets
+
+
+DEFAULT_FEED_TARGETS = {
+    "reddit": ["/r/popular.json?limit=40&raw_json=1"],
+    "mastodon": ["https://mastodon.social/api/v1/trends/statuses?limit=40"],
+    "bluesky": ["https://public.api.bsky.app/xrpc/app.bsky.feed.getFeed?feed=at://did:plc:z72i7hdynmk6r22z27h6tvur/app.bsky.feed.generator/whats-hot&limit=40"],
+    "lemmy": ["https://lemmy.world/feeds/all.xml?sort=Hot"],
+    "piefed": ["https://lemmy.world/feeds/c/pics.xml?sort=Hot"],
+    "misskey": ["https://misskey.design/api/notes/local-timeline"],
+    "rss": ["https://hnrss.org/frontpage", "https://lobste.rs/rss", "https://lifehacker.com/rss", "https://makezine.com/feed/"],
+    "nitter": [],
+}
+
+BATCH_MAX_URLS = int(os.getenv("SOCIAL_PORTAL_BATCH_MAX_URLS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("SOCIAL_PORTAL_BATCH_MAX_CONCURRENCY", "6"))
+BATCH_ITEM_TIMEOUT_MS = int(os.getenv("SOCIAL_PORTAL_BATCH_ITEM_TIMEOUT_MS", "10000"))
+BATCH_MAX_REQUEST_BYTES = 256 * 1024
+
+PREFETCH_PATHS = [path.strip() for path in os.getenv("SOCIAL_PORTAL_PREFETCH_PATHS", "").split(",") if path.strip().startswith("/api/")]
+PREFETCH_TOP_KEYS = int(os.getenv("SOCIAL_PORTAL_PREFETCH_TOP_KEYS", "8"))
+PREFETCH_MIN_HITS = int(os.getenv("SOCIAL_PORTAL_PREFETCH_MIN_HITS", "3"))
+PREFETCH_INTERVAL_SECONDS = int(os.getenv("SOCIAL_PORTAL_PREFETCH_INTERVAL_SECONDS", "15"))
+PREFETCH_IDLE_SECONDS = int(os.getenv("SOCIAL_PORTAL_PREFETCH_IDLE_SECONDS", "300"))
+PREFETCH_MAX_PER_ROUND = 4
+PREFETCH_HALF_LIFE_SECONDS = 600
+PREFETCH_MAX_TRACKED = 256
+PREFETCH_HEADER = "X-Social-Portal-Prefetch"
+
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_MAX_SOURCES = int(os.getenv("SOCIAL_PORTAL_METRICS_MAX_SOURCES", "100"))
+SERVER_TIMING_MAX_ENTRIES = 16
+
+FEED_ENABLED = parse_bool_env("SOCIAL_PORTAL_FEED", True)
+FEED_TARGETS = parse_feed_targets_env("SOCIAL_PORTAL_FEED_TARGETS", DEFAULT_FEED_TARGETS)
+FEED_DEFAULT_NETWORKS = [n.strip().lower() for n in os.getenv("SOCIAL_PORTAL_FEED_NETWORKS", "reddit,mastodon,bluesky,lemmy,misskey").split(",") if n.strip()]
+FEED_NETWORK_DEADLINE_MS = int(os.getenv("SOCIAL_PORTAL_FEED_NETWORK_DEADLINE_MS", "8000"))
+FEED_NETWORK_DEADLINES_MS = parse_ttl_env("SOCIAL_PORTAL_FEED_NETWORK_DEADLINES_MS", {})
+FEED_PAGE_SIZE = int(os.getenv("SOCIAL_PORTAL_FEED_PAGE_SIZE", "40"))
+FEED_MAX_PAGE_SIZE = 200
+FEED_MAX_OUTSTANDING = int(os.getenv("SOCIAL_PORTAL_FEED_MAX_OUTSTANDING", "32"))
+FEED_ITEMS_PER_TARGET = 40
+FEED_IMAGE_SRC = re.compile(r'src="([^"]+\.(?:jpg|jpeg|png|gif|webp)[^"]*)"', re.IGNORECASE)
+FEED_VIDEO_SRC = re.compile(r'src="([^"]+\.(?:mp4|webm|mov))"', re.IGNORECASE)
+
+
+def header_value(headers, name):
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def decode_body(body, encoding):
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decode_prefix(data, encoding, limit):
+    encoding = (encoding or "identity").strip().lower()
+    try:
+        if encoding in ("", "identity"):
+            return data[:limit]
+        if encoding in ("gzip", "x-gzip"):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, limit)
+        if encoding == "deflate":
+            try:
+                return zlib.decompressobj().decompress(data, limit)
+            except zlib.error:
+                return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, limit)
+        if encoding == "br" and brotli is not None:
+            return brotli.Decompressor().process(data)[:limit]
+    except (zlib.error, brotli.error if brotli is not None else zlib.error):
+        pass
+    return b""
+
+
+def stream_decoder(encoding):
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return decompressor.decompress, decompressor.flush
+    if encoding == "deflate":
+        decompressor = zlib.decompressobj()
+        return decompressor.decompress, decompressor.flush
+    if encoding == "br" and brotli is not None:
+        decompressor = brotli.Decompressor()
+        return decompressor.process, lambda: b""
+    return None
+
+
+def stream_gzip_encoder():
+    compressor = zlib.compressobj(max(1, min(9, COMPRESSION_LEVEL)), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def encode_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=max(0, min(11, COMPRESSION_LEVEL)))
+    return gzip.compress(body, compresslevel=max(1, min(9, COMPRESSION_LEVEL)), mtime=0)
+
+
+def parse_accept_encoding(raw):
+    accepted = set()
+    for item in (raw or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name)
+    if "*" in accepted:
+        accepted.add("gzip")
+    return accepted
+
+
+def is_compressible(content_type):
+    lowered = (content_type or "").lower()
+    return any(marker in lowered for marker in COMPRESSIBLE_TYPES)
+
+
+def choose_client_encoding(accepted, content_type, size):
+    if not COMPRESSION_ENABLED or size < COMPRESSION_MIN_BYTES or not is_compressible(content_type):
+        return None
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or any(tag in candidates for tag in etags)
+
+
+class StaticFile:
+    def __init__(self, url_path, fs_path, content):
+        self.url_path = url_path
+        self.fs_path = fs_path
+        self.size = len(content)
+        self.content_type = mimetypes.guess_type(fs_path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type in ("application/javascript", "image/svg+xml"):
+            self.content_type = f"{self.content_type}; charset=utf-8"
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+        self.body = content if self.size < SENDFILE_MIN_BYTES or url_path.endswith("/index.html") else None
+        if url_path.startswith("/assets/"):
+            self.cache_control = "public, max-age=31536000, immutable"
+        else:
+            self.cache_control = "no-cache"
+        self.variants = {}
+        self.load_variants(content)
+
+    def load_variants(self, content):
+        for encoding, extension in (("br", ".br"), ("gzip", ".gz")):
+            if encoding == "br" and brotli is None:
+                continue
+            sibling = self.fs_path + extension
+            if os.path.isfile(sibling):
+                with open(sibling, "rb") as f:
+                    self.variants[encoding] = f.read()
+        if STATIC_PRECOMPRESS and is_compressible(self.content_type) and self.size >= COMPRESSION_MIN_BYTES:
+            for encoding in ("br", "gzip"):
+                if encoding in self.variants or (encoding == "br" and brotli is None):
+                    continue
+                encoded = encode_body(content, encoding)
+                if len(encoded) < self.size:
+                    self.variants[encoding] = encoded
+
+    def variant_etag(self, encoding):
+        return f'{self.etag[:-1]}-{encoding}"' if encoding else self.etag
+
+
+class StaticIndex:
+    def __init__(self, root):
+        self.root = root
+        self.files = {}
+        self.total_bytes = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith((".br", ".gz")) and os.path.isfile(os.path.join(directory, filename[:-3])):
+                    continue
+                fs_path = os.path.join(directory, filename)
+                relative = os.path.relpath(fs_path, root).replace(os.sep, "/")
+                with open(fs_path, "rb") as f:
+                    content = f.read()
+                static_file = StaticFile(f"/{relative}", fs_path, content)
+                self.files[static_file.url_path] = static_file
+                self.total_bytes += static_file.size
+                if filename == "index.html":
+                    self.files[f"/{relative[:-len('index.html')]}"] = static_file
+        self.fallback = self.files.get("/index.html")
+
+    def lookup(self, url_path):
+        static_file = self.files.get(url_path)
+        if static_file is None and not url_path.endswith("/"):
+            static_file = self.files.get(f"{url_path}/")
+        return static_file or self.fallback
+
+
+def build_static_index(root):
+    started = time.monotonic()
+    index = StaticIndex(root)
+    print(f"Static index: {len(index.files)} routes, {index.total_bytes // 1024} KB in {time.monotonic() - started:.2f}s")
+    return index
+
+
+STATIC_INDEX = None
 
 
 def build_ssl_context():
@@ -139,318 +559,3364 @@ def build_ssl_context():
     return ctx
 
 
-def is_html_like(content_type, body_text):
-    lowered_type = (content_type or "").lower()
-    if "text/html" in lowered_type:
-        return True
-    sample = body_text[:600].lower()
-    return "<!doctype html" in sample or "<html" in sample
+def build_jina_ssl_context():
+    ctx = build_ssl_context()
+    if JINA_TLS_CIPHERS:
+        try:
+            ctx.set_ciphers(JINA_TLS_CIPHERS)
+        except ssl.SSLError as e:
+            print(f"[jina] ignoring SOCIAL_PORTAL_JINA_TLS_CIPHERS: {e}")
+    if JINA_ALPN_ENABLED:
+        ctx.set_alpn_protocols(["http/1.1"])
+    return ctx
 
 
-def has_challenge_markers(body_text, markers):
-    lowered = body_text.lower()
-    return any(marker in lowered for marker in markers)
+class UpstreamCancelled(Exception):
+    pass
 
 
-def validate_nitter_payload(content_type, body_text):
-    if not body_text:
-        return False
-    has_rss = "<rss" in body_text or "<channel" in body_text or "<feed" in body_text
-    if has_rss:
-        return not has_challenge_markers(body_text, NITTER_CHALLENGE_MARKERS)
-    return False
+class UpstreamBusy(Exception):
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} is busy (request shed)")
+        self.host = host
+        self.retry_after = retry_after
 
 
-def validate_redlib_payload(content_type, body_text):
-    if not body_text:
-        return False
-    if is_html_like(content_type, body_text):
-        return False
-    if has_challenge_markers(body_text, REDLIB_CHALLENGE_MARKERS):
-        return False
-    try:
-        payload = json.loads(body_text)
-    except json.JSONDecodeError:
-        return False
-    data = payload.get("data")
-    return payload.get("kind") == "Listing" and isinstance(data, dict) and isinstance(data.get("children"), list)
+class HostLimit:
+    def __init__(self, max_in_flight, rate):
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate = max(0.0, rate)
+        self.burst = max(1.0, self.rate)
+        self.tokens = self.burst
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "timedOut": 0}
 
+    def refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
 
-class SPAHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIST_DIR, **kwargs)
+    def admissible(self):
+        return self.in_flight < self.max_in_flight and (self.rate <= 0 or self.tokens >= 1)
 
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        route_path = parsed.path
+    def token_wait(self):
+        if self.rate <= 0 or self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
 
-        if route_path == "/api/proxy":
-            params = parse_qs(parsed.query)
-            if "url" not in params:
-                self.send_error(400, "Missing url query parameter")
-                return
-            self.handle_proxy_direct(params["url"][0])
-            return
+    def retry_after(self):
+        if self.rate <= 0:
+            return 1
+        return max(1, math.ceil((self.waiting + 1) / self.rate))
 
-        if route_path.startswith("/api/nitter"):
-            self.handle_network_bridge(
-                route_path=route_path,
-                query=parsed.query,
-                prefix="/api/nitter",
-                network_name="nitter",
-                enabled=NITTER_ENABLED,
-                sources=NITTER_SOURCES,
-                validator=validate_nitter_payload,
-                accept_header="application/rss+xml, application/xml, text/xml, */*",
-                fallback_sources=NITTER_PUBLIC,
-                fallback_content_type="application/rss+xml; charset=utf-8",
-            )
-            return
 
-        if route_path.startswith("/api/redlib"):
-            self.handle_network_bridge(
-                route_path=route_path,
-                query=parsed.query,
-                prefix="/api/redlib",
-                network_name="redlib",
-                enabled=REDLIB_ENABLED,
-                sources=REDLIB_SOURCES,
-                validator=validate_redlib_payload,
-                accept_header="application/json, text/plain, */*",
-                fallback_sources=REDLIB_PUBLIC,
-                fallback_content_type="application/json; charset=utf-8",
-            )
-            return
+class UpstreamLimiter:
+    def __init__(self, max_in_flight, rate, queue_size, queue_timeout_seconds, host_limits):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout_seconds = max(0, queue_timeout_seconds)
+        self.host_limits = host_limits
+        self.processes = 1
+        self.cond = threading.Condition()
+        self.hosts = {}
 
-        if route_path == "/api/healthz":
-            self.handle_healthz()
-            return
+    def share(self, processes):
+        with self.cond:
+            self.processes = max(1, processes)
+            self.hosts = {}
 
-        for prefix, target in PROXIES.items():
-            if route_path.startswith(prefix):
-                self.handle_proxy(target, prefix)
+    def host_locked(self, host):
+        limit = self.hosts.get(host)
+        if limit is None:
+            max_in_flight, rate = self.host_limits.get(host, (self.max_in_flight, self.rate))
+            limit = self.hosts[host] = HostLimit(math.ceil(max_in_flight / self.processes), rate / self.processes)
+        return limit
+
+    def acquire(self, host, timeout_seconds):
+        deadline = time.monotonic() + min(self.queue_timeout_seconds, timeout_seconds)
+        with self.cond:
+            limit = self.host_locked(host)
+            limit.refill(time.monotonic())
+            if limit.admissible() and limit.waiting == 0:
+                limit.in_flight += 1
+                limit.tokens -= 1 if limit.rate > 0 else 0
+                limit.stats["admitted"] += 1
                 return
+            if limit.waiting >= self.queue_size:
+                limit.stats["shed"] += 1
+                raise UpstreamBusy(host, limit.retry_after())
+            limit.waiting += 1
+            limit.stats["queued"] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    limit.refill(now)
+                    if limit.admissible():
+                        limit.in_flight += 1
+                        limit.tokens -= 1 if limit.rate > 0 else 0
+                        limit.stats["admitted"] += 1
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        limit.stats["timedOut"] += 1
+                        raise UpstreamBusy(host, limit.retry_after())
+                    if limit.in_flight < limit.max_in_flight:
+                        remaining = min(remaining, limit.token_wait())
+                    self.cond.wait(remaining)
+            finally:
+                limit.waiting -= 1
 
-        path = self.translate_path(self.path)
-        if not os.path.exists(path) or os.path.isdir(path):
-            if not os.path.exists(path):
-                self.path = "/index.html"
+    def release(self, host):
+        with self.cond:
+            limit = self.hosts.get(host)
+            if limit is not None:
+                limit.in_flight = max(0, limit.in_flight - 1)
+            self.cond.notify_all()
 
-        super().do_GET()
+    def snapshot(self):
+        with self.cond:
+            return {
+                host: {**limit.stats, "inFlight": limit.in_flight, "waiting": limit.waiting, "maxInFlight": limit.max_in_flight, "rate": limit.rate}
+                for host, limit in self.hosts.items()
+            }
 
-    def end_headers(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, User-Agent")
-        super().end_headers()
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.end_headers()
+UPSTREAM_LIMITER = (
+    UpstreamLimiter(UPSTREAM_MAX_IN_FLIGHT, UPSTREAM_RATE_PER_SECOND, UPSTREAM_QUEUE_SIZE, UPSTREAM_QUEUE_TIMEOUT_MS / 1000, UPSTREAM_HOST_LIMITS)
+    if UPSTREAM_LIMITS_ENABLED
+    else None
+)
 
-    def request_url(self, target_url, accept_header, timeout_seconds):
-        req = urllib.request.Request(target_url)
-        req.add_header("User-Agent", random.choice(USER_AGENTS))
-        req.add_header("Accept", accept_header)
-        req.add_header("Accept-Language", "en-US,en;q=0.5")
-        with urllib.request.urlopen(req, timeout=timeout_seconds, context=build_ssl_context()) as response:
-            body = response.read()
-            return response.status, dict(response.headers.items()), body
 
-    def send_binary_response(self, status_code, headers, body):
-        self.send_response(status_code)
-        for key, value in headers.items():
-            if key.lower() not in HOP_BY_HOP_HEADERS:
-                self.send_header(key, value)
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+class upstream_slot:
+    def __init__(self, url, timeout_seconds):
+        self.host = (urlparse(url).hostname or "").lower()
+        self.timeout_seconds = timeout_seconds
 
-    def source_url(self, base_url, suffix):
-        joined = urljoin(f"{base_url.rstrip('/')}/", suffix.lstrip("/"))
-        return joined
+    def __enter__(self):
+        if UPSTREAM_LIMITER is not None:
+            UPSTREAM_LIMITER.acquire(self.host, self.timeout_seconds)
+        return self
 
-    def resolve_suffix(self, route_path, query, prefix):
-        suffix = route_path[len(prefix):]
-        if not suffix:
-            suffix = "/"
-        if not suffix.startswith("/"):
-            suffix = f"/{suffix}"
-        if query:
-            suffix = f"{suffix}?{query}"
-        return suffix
+    def __exit__(self, exc_type, exc, tb):
+        if UPSTREAM_LIMITER is not None:
+            UPSTREAM_LIMITER.release(self.host)
+        return False
 
-    def fetch_valid_source(self, network_name, sources, suffix, validator, accept_header, timeout_seconds):
-        failures = []
-        for source in sources[:max(1, MAX_DIRECT_SOURCE_ATTEMPTS)]:
-            target_url = self.source_url(source, suffix)
-            print(f"[{network_name}] trying {target_url}")
-            try:
-                status_code, headers, body = self.request_url(target_url, accept_header, timeout_seconds)
-                content_type = headers.get("Content-Type", "")
-                decoded = body.decode("utf-8", errors="ignore")
-                if status_code == 200 and validator(content_type, decoded):
-                    return {
-                        "ok": True,
-                        "status": status_code,
-                        "headers": headers,
-                        "body": body,
-                        "source": source,
-                        "target_url": target_url,
-                    }
-                failures.append(f"{target_url} -> invalid payload (status={status_code})")
-            except urllib.error.HTTPError as e:
-                failures.append(f"{target_url} -> HTTP {e.code}")
-            except Exception as e:
-                failures.append(f"{target_url} -> {e}")
-        return {"ok": False, "failures": failures}
 
-    def fetch_safe_proxy_fallback(self, network_name, fallback_sources, suffix, validator, content_type):
-        if not fallback_sources:
-            return {"ok": False, "error": f"{network_name}: no fallback source configured"}
-        errors = []
-        for fallback_source in fallback_sources[:max(1, MAX_PROXY_FALLBACK_ATTEMPTS)]:
-            target_url = self.source_url(fallback_source, suffix)
-            allorigins_url = f"https://api.allorigins.win/get?url={quote(target_url, safe='')}"
-            print(f"[{network_name}] proxy fallback via {allorigins_url}")
+class CancelToken:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.connections = set()
+
+    def attach(self, conn):
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.connections.add(conn)
+            return True
+
+    def detach(self, conn):
+        with self.lock:
+            self.connections.discard(conn)
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            connections = list(self.connections)
+            self.connections.clear()
+        for conn in connections:
+            sock = conn.sock
+            if sock is None:
+                continue
             try:
-                status_code, _, body = self.request_url(allorigins_url, "application/json, */*", REQUEST_TIMEOUT_SECONDS)
-                if status_code != 200:
-                    errors.append(f"{target_url} -> fallback status {status_code}")
-                    continue
-                wrapped = json.loads(body.decode("utf-8", errors="ignore"))
-                content = wrapped.get("contents", "")
-                if not validator("text/plain", content):
-                    errors.append(f"{target_url} -> fallback payload validation failed")
-                    continue
-                return {
-                    "ok": True,
-                    "status": 200,
-                    "headers": {"Content-Type": content_type},
-                    "body": content.encode("utf-8"),
-                    "source": f"allorigins:{fallback_source}",
-                }
-            except Exception as e:
-                errors.append(f"{target_url} -> fallback failed ({e})")
-        return {"ok": False, "error": "; ".join(errors[:6])}
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
-    def handle_network_bridge(self, route_path, query, prefix, network_name, enabled, sources, validator, accept_header, fallback_sources, fallback_content_type):
-        if not enabled:
-            self.send_error(503, f"{network_name} bridge disabled")
-            return
-        if not sources:
-            self.send_error(503, f"{network_name} bridge has no sources configured")
-            return
 
-        suffix = self.resolve_suffix(route_path, query, prefix)
-        result = self.fetch_valid_source(
-            network_name=network_name,
-            sources=sources,
-            suffix=suffix,
-            validator=validator,
-            accept_header=accept_header,
-            timeout_seconds=REQUEST_TIMEOUT_SECONDS,
-        )
-        if result.get("ok"):
-            print(f"[{network_name}] success via {result['source']}")
-            self.send_binary_response(result["status"], result["headers"], result["body"])
-            return
+class RequestTiming:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.entries = []
+        self.outcome = None
 
-        fallback = self.fetch_safe_proxy_fallback(network_name, fallback_sources, suffix, validator, fallback_content_type)
-        if fallback.get("ok"):
-            print(f"[{network_name}] success via fallback {fallback['source']}")
-            self.send_binary_response(fallback["status"], fallback["headers"], fallback["body"])
-            return
+    def add(self, name, seconds):
+        with self.lock:
+            if len(self.entries) < SERVER_TIMING_MAX_ENTRIES:
+                self.entries.append((name, seconds))
 
-        failure_parts = result.get("failures", []) + [fallback.get("error", "unknown fallback failure")]
-        error_body = json.dumps(
-            {
-                "error": f"{network_name} bridge failed",
-                "details": failure_parts[:8],
-            },
-            indent=2,
-        ).encode("utf-8")
-        self.send_response(502)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(error_body)))
-        self.end_headers()
-        self.wfile.write(error_body)
+    def header(self, cache_status=None):
+        with self.lock:
+            parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.entries]
+        parts.append(f"total;dur={(time.monotonic() - self.started) * 1000:.1f}")
+        if cache_status:
+            parts.append(f'cache;desc="{cache_status}"')
+        return ", ".join(parts)
 
-    def handle_proxy_direct(self, target_url):
-        print(f"Direct Proxying -> {target_url}")
-        try:
-            # r.jina.ai blocks Python urllib user agents/TLS fingerprints; proxy via allorigins.
-            try:
-                host = urlparse(target_url).hostname or ""
-            except Exception:
-                host = ""
-            if host.lower() == "r.jina.ai":
-                result = subprocess.run(
-                    ["curl", "-sS", "-L", "--max-time", str(max(REQUEST_TIMEOUT_SECONDS, 20)), "-A", JINA_USER_AGENT, "-H", "Accept: text/plain", target_url],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=False,
-                )
-                if result.returncode != 0:
-                    raise Exception(result.stderr.decode("utf-8", errors="ignore").strip() or f"curl failed ({result.returncode})")
-                self.send_binary_response(
-                    200,
-                    {"Content-Type": "text/plain; charset=utf-8", "X-Proxy-Source": "curl"},
-                    result.stdout,
-                )
-                return
-            status_code, headers, body = self.request_url(
-                target_url,
-                "application/rss+xml, application/xml, text/xml, application/json, */*",
-                REQUEST_TIMEOUT_SECONDS,
-            )
-            self.send_binary_response(status_code, headers, body)
-        except urllib.error.HTTPError as e:
-            self.send_response(e.code)
-            self.end_headers()
-            self.wfile.write(e.read())
-        except Exception as e:
-            self.send_response(500)
-            self.end_headers()
-            self.wfile.write(str(e).encode("utf-8"))
 
-    def handle_proxy(self, target_base, prefix):
-        path_suffix = self.path[len(prefix):]
-        target_url = target_base + path_suffix
-        print(f"Proxying {self.path} -> {target_url}")
-        try:
-            status_code, headers, body = self.request_url(
-                target_url,
-                "application/rss+xml, application/xml, text/xml, application/json, */*",
-                REQUEST_TIMEOUT_SECONDS,
-            )
-            self.send_binary_response(status_code, headers, body)
-        except urllib.error.HTTPError as e:
-            self.send_response(e.code)
-            self.end_headers()
-            self.wfile.write(e.read())
-        except Exception as e:
-            self.send_response(500)
-            self.end_headers()
-            self.wfile.write(str(e).encode("utf-8"))
+REQUEST_TIMING = threading.local()
 
-    def probe_network(self, network_name, enabled, sources, path, validator, accept_header):
-        details = {
-            "enabled": enabled,
-            "sources": len(sources),
-            "selfHostedSources": len([s for s in sources if s in (NITTER_SELF_HOSTED if network_name == "nitter" else REDLIB_SELF_HOSTED)]),
+
+def current_timing():
+    return getattr(REQUEST_TIMING, "current", None)
+
+
+def record_timing(name, seconds):
+    timing = current_timing()
+    if timing is not None:
+        timing.add(name, seconds)
+    phases = getattr(REQUEST_TIMING, "attempt", None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0) + seconds
+
+
+def split_timeout(timeout):
+    return timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+
+def is_timeout_error(error):
+    return isinstance(error, TimeoutError) or isinstance(getattr(error, "reason", None), TimeoutError)
+
+
+class UpstreamStream:
+    def __init__(self, pool, key, conn, response, url, cancel_token=None, on_done=None):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.url = url
+        self.cancel_token = cancel_token
+        self.status = response.status
+        self.reason = response.reason
+        self.message = response.headers
+        self.headers = dict(response.headers.items())
+        self.pending = []
+        self.done = False
+        self.on_done = on_done
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        if self.cancel_token is not None:
+            self.cancel_token.detach(self.conn)
+        if self.response.will_close:
+            self.conn.close()
+        else:
+            self.response.close()
+            self.pool.release(self.key, self.conn)
+        if self.on_done is not None:
+            self.on_done()
+
+    def close(self):
+        if self.done:
+            return
+        self.done = True
+        if self.cancel_token is not None:
+            self.cancel_token.detach(self.conn)
+        self.conn.close()
+        if self.on_done is not None:
+            self.on_done()
+
+    def read_upstream(self, size=None):
+        try:
+            return self.response.read1(size) if size else self.response.read()
+        except Exception as e:
+            self.close()
+            if self.cancel_token is not None and self.cancel_token.cancelled:
+                raise UpstreamCancelled(self.url) from e
+            raise
+
+    def peek(self, limit):
+        collected = b"".join(self.pending)
+        while len(collected) < limit and not self.done:
+            chunk = self.read_upstream(STREAM_CHUNK_BYTES)
+            if not chunk:
+                self.finish()
+                break
+            self.pending.append(chunk)
+            collected += chunk
+        return collected
+
+    def read_chunk(self):
+        if self.pending:
+            return self.pending.pop(0)
+        if self.done:
+            return b""
+        chunk = self.read_upstream(STREAM_CHUNK_BYTES)
+        if not chunk:
+            self.finish()
+        return chunk
+
+    def read_all(self):
+        parts = self.pending
+        self.pending = []
+        if not self.done:
+            parts.append(self.read_upstream())
+            self.finish()
+        return b"".join(parts)
+
+
+class UpstreamConnectionPool:
+    def __init__(self, ssl_context, max_per_host, idle_seconds, limiter=None):
+        self.ssl_context = ssl_context
+        self.limiter = limiter
+        self.max_per_host = max(1, max_per_host)
+        self.idle_seconds = max(0, idle_seconds)
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.stats = {"opened": 0, "reused": 0, "evicted": 0, "retried": 0}
+
+    def host_key(self, parsed):
+        scheme = (parsed.scheme or "").lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported upstream scheme: {scheme or 'none'}")
+        if not parsed.hostname:
+            raise ValueError("Upstream URL has no host")
+        port = parsed.port or (443 if scheme == "https" else 80)
+        return scheme, parsed.hostname.lower(), port
+
+    def prune_locked(self, now):
+        for key in list(self.idle):
+            fresh = []
+            for conn, released_at in self.idle[key]:
+                if now - released_at > self.idle_seconds:
+                    conn.close()
+                    self.stats["evicted"] += 1
+                else:
+                    fresh.append((conn, released_at))
+            if fresh:
+                self.idle[key] = fresh
+            else:
+                del self.idle[key]
+
+    def acquire(self, key, timeout):
+        with self.lock:
+            self.prune_locked(time.monotonic())
+            entries = self.idle.get(key)
+            if entries:
+                conn, _ = entries.pop()
+                self.stats["reused"] += 1
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.stats["opened"] += 1
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self.lock:
+            self.prune_locked(time.monotonic())
+            entries = self.idle.setdefault(key, [])
+            if len(entries) >= self.max_per_host:
+                conn.close()
+                self.stats["evicted"] += 1
+                return
+            entries.append((conn, time.monotonic()))
+
+    def start(self, url, headers, timeout, cancel_token=None, method="GET", data=None):
+        parsed = urlparse(url)
+        key = self.host_key(parsed)
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        on_done = None
+        if self.limiter is not None:
+            self.limiter.acquire(key[1], split_timeout(timeout)[1])
+            on_done = lambda: self.limiter.release(key[1])
+        try:
+            return self.start_admitted(url, key, path, headers, timeout, cancel_token, method, data, on_done)
+        except BaseException:
+            if on_done is not None:
+                on_done()
+            raise
+
+    def start_admitted(self, url, key, path, headers, timeout, cancel_token, method, data, on_done):
+        connect_timeout, read_timeout = split_timeout(timeout)
+        for attempt in range(2):
+            conn, reused = self.acquire(key, read_timeout)
+            if cancel_token is not None and not cancel_token.attach(conn):
+                self.release(key, conn)
+                raise UpstreamCancelled(url)
+            try:
+                if conn.sock is None:
+                    connect_started = time.monotonic()
+                    conn.timeout = connect_timeout
+                    conn.connect()
+                    record_timing("connect", time.monotonic() - connect_started)
+                    conn.timeout = read_timeout
+                    conn.sock.settimeout(read_timeout)
+                request_started = time.monotonic()
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                record_timing("ttfb", time.monotonic() - request_started)
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                if cancel_token is not None:
+                    cancel_token.detach(conn)
+                    if cancel_token.cancelled:
+                        raise UpstreamCancelled(url)
+                if reused and attempt == 0:
+                    with self.lock:
+                        self.stats["retried"] += 1
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                if cancel_token is not None:
+                    cancel_token.detach(conn)
+                    if cancel_token.cancelled:
+                        raise UpstreamCancelled(url)
+                raise
+            return UpstreamStream(self, key, conn, response, url, cancel_token, on_done)
+        raise ConnectionError(f"Upstream connection to {key[1]} failed")
+
+    def open(self, url, headers, timeout, cancel_token=None, method="GET", data=None):
+        current_url = url
+        for _ in range(MAX_UPSTREAM_REDIRECTS + 1):
+            stream = self.start(current_url, headers, timeout, cancel_token, method, data)
+            location = stream.message.get("Location")
+            if stream.status in REDIRECT_STATUSES and location:
+                stream.read_all()
+                current_url = urljoin(current_url, location)
+                if stream.status in (301, 302, 303):
+                    method, data = "GET", None
+                continue
+            if not 200 <= stream.status < 300:
+                body = stream.read_all()
+                raise urllib.error.HTTPError(current_url, stream.status, stream.reason, stream.message, io.BytesIO(body))
+            return stream
+        body = stream.read_all()
+        raise urllib.error.HTTPError(current_url, stream.status, "Too many redirects", stream.message, io.BytesIO(body))
+
+    def request(self, url, headers, timeout, cancel_token=None, method="GET", data=None):
+        stream = self.open(url, headers, timeout, cancel_token, method, data)
+        body = stream.read_all()
+        return stream.status, stream.headers, body
+
+    def snapshot(self):
+        with self.lock:
+            self.prune_locked(time.monotonic())
+            return {
+                **self.stats,
+                "idle": sum(len(entries) for entries in self.idle.values()),
+                "hosts": len(self.idle),
+            }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def adaptive_timeout(samples, ceiling):
+    if not ADAPTIVE_TIMEOUTS_ENABLED or len(samples) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+        return ceiling
+    return min(ceiling, max(ADAPTIVE_TIMEOUT_FLOOR_MS / 1000, percentile(samples, 0.99) * ADAPTIVE_TIMEOUT_FACTOR))
+
+
+SHARED_HEALTH_FIELDS = (
+    "successes",
+    "failures",
+    "consecutive_failures",
+    "challenge_hits",
+    "success_rate",
+    "latency_ewma",
+    "state",
+    "cooldown",
+    "last_success",
+    "last_failure",
+    "last_error",
+    "last_probe",
+    "last_probe_ok",
+)
+
+
+class SourceHealth:
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.challenge_hits = 0
+        self.success_rate = 0.5
+        self.latency_ewma = None
+        self.state = "closed"
+        self.open_until = 0.0
+        self.cooldown = 0
+        self.probe_in_flight = False
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self.last_probe = None
+        self.last_probe_ok = None
+        self.latencies = deque(maxlen=SOURCE_LATENCY_SAMPLES)
+        self.connect_latencies = deque(maxlen=SOURCE_LATENCY_SAMPLES)
+        self.ttfb_latencies = deque(maxlen=SOURCE_LATENCY_SAMPLES)
+
+    def timeouts(self, ceiling):
+        return adaptive_timeout(self.connect_latencies, ceiling), adaptive_timeout(self.ttfb_latencies, ceiling)
+
+    def shared_fields(self):
+        fields = {name: getattr(self, name) for name in SHARED_HEALTH_FIELDS}
+        fields["open_until"] = time.time() + (self.open_until - time.monotonic()) if self.state == "open" else 0
+        return fields
+
+    def apply_shared(self, fields):
+        for name in SHARED_HEALTH_FIELDS:
+            if name in fields:
+                setattr(self, name, fields[name])
+        self.open_until = time.monotonic() + (fields.get("open_until", 0) - time.time()) if self.state == "open" else 0.0
+
+    def refresh_state(self, now):
+        if self.state == "open" and now >= self.open_until:
+            self.state = "half_open"
+            self.probe_in_flight = False
+
+    def rank_key(self):
+        latency = self.latency_ewma if self.latency_ewma is not None else REQUEST_TIMEOUT_SECONDS / 2
+        return -round(self.success_rate, 1), latency
+
+    def to_dict(self, now):
+        wall_now = time.time()
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "challengeHits": self.challenge_hits,
+            "successRate": round(self.success_rate, 3),
+            "latencyMs": round(self.latency_ewma * 1000) if self.latency_ewma is not None else None,
+            "cooldownSeconds": self.cooldown,
+            "retryInSeconds": round(max(0.0, self.open_until - now), 1) if self.state == "open" else 0,
+            "lastSuccessAgeSeconds": round(wall_now - self.last_success, 1) if self.last_success else None,
+            "lastFailureAgeSeconds": round(wall_now - self.last_failure, 1) if self.last_failure else None,
+            "lastError": self.last_error,
+            "p50LatencyMs": round(percentile(self.latencies, 0.5) * 1000) if self.latencies else None,
+            "p95LatencyMs": round(percentile(self.latencies, 0.95) * 1000) if self.latencies else None,
+            "latencySamples": len(self.latencies),
+            "lastProbeAgeSeconds": round(wall_now - self.last_probe, 1) if self.last_probe else None,
+            "lastProbeOk": self.last_probe_ok,
+            "connectTimeoutMs": round(self.timeouts(REQUEST_TIMEOUT_SECONDS)[0] * 1000),
+            "readTimeoutMs": round(self.timeouts(REQUEST_TIMEOUT_SECONDS)[1] * 1000),
+        }
+
+
+class SourceHealthRegistry:
+    def __init__(self, failure_threshold, base_cooldown, max_cooldown):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = max(1, base_cooldown)
+        self.max_cooldown = max(self.base_cooldown, max_cooldown)
+        self.lock = threading.Lock()
+        self.sources = {}
+        self.shared = None
+
+    def publish(self, source, fields):
+        if self.shared is not None:
+            self.shared.publish_source(source, fields)
+
+    def sync(self):
+        if self.shared is None:
+            return
+        changes = self.shared.source_changes()
+        if changes:
+            with self.lock:
+                for source, fields in changes:
+                    self.entry_locked(source).apply_shared(fields)
+
+    def entry_locked(self, source):
+        health = self.sources.get(source)
+        if health is None:
+            health = SourceHealth()
+            self.sources[source] = health
+        return health
+
+    def order(self, sources):
+        self.sync()
+        now = time.monotonic()
+        available = []
+        blocked = []
+        with self.lock:
+            for index, source in enumerate(sources):
+                health = self.entry_locked(source)
+                health.refresh_state(now)
+                if health.state == "open" or (health.state == "half_open" and health.probe_in_flight):
+                    blocked.append((health.open_until, index, source))
+                else:
+                    available.append((health.rank_key(), index, source))
+        if not available:
+            return [source for _, _, source in sorted(blocked)]
+        return [source for _, _, source in sorted(available)]
+
+    def begin(self, source):
+        with self.lock:
+            health = self.entry_locked(source)
+            health.refresh_state(time.monotonic())
+            if health.state == "half_open":
+                health.probe_in_flight = True
+
+    def timeouts(self, source, ceiling):
+        with self.lock:
+            return self.entry_locked(source).timeouts(ceiling)
+
+    def record_phases(self, source, phases):
+        with self.lock:
+            health = self.entry_locked(source)
+            if "connect" in phases:
+                health.connect_latencies.append(phases["connect"])
+            if "ttfb" in phases:
+                health.ttfb_latencies.append(phases["ttfb"])
+
+    def record_timeout(self, source, timeouts, during_connect):
+        with self.lock:
+            health = self.entry_locked(source)
+            if during_connect:
+                health.connect_latencies.append(timeouts[0])
+            health.ttfb_latencies.append(timeouts[1])
+
+    def record_success(self, source, latency_seconds):
+        with self.lock:
+            health = self.entry_locked(source)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.success_rate += SOURCE_EWMA_ALPHA * (1 - health.success_rate)
+            if health.latency_ewma is None:
+                health.latency_ewma = latency_seconds
+            else:
+                health.latency_ewma += SOURCE_EWMA_ALPHA * (latency_seconds - health.latency_ewma)
+            health.latencies.append(latency_seconds)
+            health.state = "closed"
+            health.cooldown = 0
+            health.probe_in_flight = False
+            health.last_success = time.time()
+            fields = health.shared_fields()
+        self.publish(source, fields)
+
+    def record_failure(self, source, kind, error):
+        with self.lock:
+            health = self.entry_locked(source)
+            health.failures += 1
+            health.consecutive_failures += 1
+            if kind == "challenge":
+                health.challenge_hits += 1
+            health.success_rate -= SOURCE_EWMA_ALPHA * health.success_rate
+            health.last_failure = time.time()
+            health.last_error = error
+            health.probe_in_flight = False
+            if health.state == "open":
+                health.open_until = time.monotonic() + health.cooldown
+            elif health.state == "half_open" or health.consecutive_failures >= self.failure_threshold:
+                if health.cooldown:
+                    health.cooldown = min(self.max_cooldown, health.cooldown * 2)
+                else:
+                    health.cooldown = self.base_cooldown
+                print(f"[health] circuit open for {source} ({health.cooldown}s cooldown)")
+                health.state = "open"
+                health.open_until = time.monotonic() + health.cooldown
+            fields = health.shared_fields()
+        self.publish(source, fields)
+
+    def probe_candidates(self, sources):
+        self.sync()
+        now = time.monotonic()
+        with self.lock:
+            candidates = []
+            for source in sources:
+                health = self.entry_locked(source)
+                health.refresh_state(now)
+                if health.state != "open":
+                    candidates.append(source)
+            return candidates
+
+    def record_probe(self, source, ok):
+        with self.lock:
+            health = self.entry_locked(source)
+            health.last_probe = time.time()
+            health.last_probe_ok = ok
+            fields = health.shared_fields()
+        self.publish(source, fields)
+
+    def snapshot(self, sources):
+        self.sync()
+        now = time.monotonic()
+        with self.lock:
+            result = {}
+            for source in sources:
+                health = self.entry_locked(source)
+                health.refresh_state(now)
+                result[source] = health.to_dict(now)
+            return result
+
+
+class SharedState:
+    # Cross-process state for multi-process mode: circuit-breaker fields per source,
+    # the latest health probe round and the last client activity, in one SQLite file.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = None
+        self.version = 0
+        self.checked_at = 0.0
+        self.activity_written = 0.0
+        self.stats = {"published": 0, "applied": 0, "errors": 0}
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS source_health (source TEXT PRIMARY KEY, pid INTEGER, version INTEGER, fields TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS probe_round (id INTEGER PRIMARY KEY, results TEXT, meta TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS activity (id INTEGER PRIMARY KEY, last_client REAL)")
+        db.execute("CREATE TABLE IF NOT EXISTS route_hits (path TEXT PRIMARY KEY, cache_key TEXT, ttl INTEGER, hits INTEGER)")
+        return db
+
+    def execute(self, sql, params=()):
+        try:
+            with self.lock:
+                if self.db is None:
+                    self.db = self.connect()
+                return self.db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"[shared-state] {e}")
+            return None
+
+    def reset(self):
+        for table in ("source_health", "probe_round", "activity", "route_hits"):
+            self.execute(f"DELETE FROM {table}")
+        self.close()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def publish_source(self, source, fields):
+        rows = self.execute(
+            "INSERT OR REPLACE INTO source_health (source, pid, version, fields) "
+            "VALUES (?, ?, (SELECT COALESCE(MAX(version), 0) + 1 FROM source_health), ?)",
+            (source, os.getpid(), json.dumps(fields)),
+        )
+        if rows is not None:
+            self.stats["published"] += 1
+
+    def source_changes(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.checked_at < SHARED_SYNC_SECONDS:
+                return []
+            self.checked_at = now
+            since = self.version
+        rows = self.execute("SELECT source, pid, version, fields FROM source_health WHERE version > ? ORDER BY version", (since,))
+        changes = []
+        for source, pid, version, fields in rows or []:
+            self.version = max(self.version, version)
+            if pid != os.getpid():
+                changes.append((source, json.loads(fields)))
+        self.stats["applied"] += len(changes)
+        return changes
+
+    def publish_round(self, results, meta):
+        self.execute("INSERT OR REPLACE INTO probe_round (id, results, meta) VALUES (1, ?, ?)", (json.dumps(results), json.dumps(meta)))
+
+    def load_round(self):
+        rows = self.execute("SELECT results, meta FROM probe_round WHERE id = 1")
+        if not rows:
+            return {}, {}
+        return json.loads(rows[0][0]), json.loads(rows[0][1])
+
+    def record_route_hits(self, batch):
+        try:
+            with self.lock:
+                if self.db is None:
+                    self.db = self.connect()
+                self.db.executemany(
+                    "INSERT INTO route_hits (path, cache_key, ttl, hits) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET cache_key = excluded.cache_key, ttl = excluded.ttl, hits = hits + excluded.hits",
+                    [(path, cache_key, ttl, hits) for path, (cache_key, ttl, hits) in batch.items()],
+                )
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"[shared-state] {e}")
+
+    def drain_route_hits(self):
+        try:
+            with self.lock:
+                if self.db is None:
+                    self.db = self.connect()
+                self.db.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = self.db.execute("SELECT path, cache_key, ttl, hits FROM route_hits").fetchall()
+                    self.db.execute("DELETE FROM route_hits")
+                finally:
+                    self.db.execute("COMMIT")
+                return rows
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"[shared-state] {e}")
+            return []
+
+    def touch(self):
+        now = time.time()
+        if now - self.activity_written < SHARED_SYNC_SECONDS * 5:
+            return
+        self.activity_written = now
+        self.execute("INSERT OR REPLACE INTO activity (id, last_client) VALUES (1, ?)", (now,))
+
+    def last_activity(self):
+        rows = self.execute("SELECT last_client FROM activity WHERE id = 1")
+        return rows[0][0] if rows else None
+
+    def snapshot(self):
+        return {**self.stats, "path": self.path, "version": self.version}
+
+
+SHARED_STATE = SharedState(SHARED_STATE_PATH) if MULTIPROCESS_ENABLED else None
+
+
+def normalize_cache_key(url):
+    parsed = urlparse(url)
+    scheme = (parsed.scheme or "").lower()
+    netloc = (parsed.hostname or "").lower()
+    if parsed.port and not ((scheme == "https" and parsed.port == 443) or (scheme == "http" and parsed.port == 80)):
+        netloc = f"{netloc}:{parsed.port}"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", "", query, ""))
+
+
+def is_jina_url(target_url):
+    try:
+        host = urlparse(target_url).hostname or ""
+    except ValueError:
+        host = ""
+    return host.lower() == "r.jina.ai"
+
+
+def direct_proxy_ttl(target_url):
+    return cache_ttl_for("/api/jina" if is_jina_url(target_url) else "/api/proxy")
+
+
+def cache_ttl_for(prefix):
+    return CACHE_TTLS.get(prefix, 0)
+
+
+def entry_checksum(headers_json, body):
+    return hashlib.sha256(headers_json.encode("utf-8") + b"\0" + body).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes, max_age_seconds):
+        self.path = path
+        self.max_bytes = max(0, max_bytes)
+        self.max_age_seconds = max(0, max_age_seconds)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "stores": 0, "evictions": 0, "corrupt": 0, "errors": 0}
+        self.shared = False
+        self.db = self.open_db()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def reopen(self):
+        with self.lock:
+            self.db = self.open_db()
+            self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self.shared = True
+
+    def connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, source TEXT, "
+            "stored_at REAL, expires_at REAL, last_access REAL, size INTEGER, checksum TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return db
+
+    def open_db(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            return self.connect()
+        except sqlite3.DatabaseError as e:
+            print(f"[disk-cache] {self.path} is unreadable ({e}), starting with an empty cache")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.replace(self.path + suffix, f"{self.path}{suffix}.corrupt")
+            return self.connect()
+
+    def delete_locked(self, key, size):
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.total_bytes -= size
+
+    def load(self, key):
+        try:
+            with self.lock:
+                row = self.db.execute(
+                    "SELECT status, headers, body, source, stored_at, expires_at, size, checksum FROM entries WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                status, headers_json, body, source, stored_at, expires_at, size, checksum = row
+                body = bytes(body)
+                if checksum != entry_checksum(headers_json, body):
+                    self.delete_locked(key, size)
+                    self.stats["corrupt"] += 1
+                    return None
+                if time.time() > stored_at + self.max_age_seconds:
+                    self.delete_locked(key, size)
+                    return None
+                self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.stats["hits"] += 1
+            return {
+                "status": status,
+                "headers": json.loads(headers_json),
+                "body": body,
+                "source": source,
+                "stored_at": stored_at,
+                "expires_at": expires_at,
+                "stale_until": stored_at + self.max_age_seconds,
+                "size": size,
+                "variants": {},
+            }
+        except (sqlite3.Error, ValueError) as e:
+            self.stats["errors"] += 1
+            print(f"[disk-cache] read failed for {key}: {e}")
+            return None
+
+    def expires_at(self, key):
+        try:
+            with self.lock:
+                row = self.db.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error:
+            return None
+
+    def store(self, key, entry):
+        headers_json = json.dumps(entry["headers"], sort_keys=True)
+        try:
+            with self.lock:
+                if self.shared:
+                    self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                previous = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO entries (key, status, headers, body, source, stored_at, expires_at, last_access, size, checksum) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        entry["status"],
+                        headers_json,
+                        sqlite3.Binary(entry["body"]),
+                        entry["source"],
+                        entry["stored_at"],
+                        entry["expires_at"],
+                        time.time(),
+                        entry["size"],
+                        entry_checksum(headers_json, entry["body"]),
+                    ),
+                )
+                self.total_bytes += entry["size"] - (previous[0] if previous else 0)
+                self.stats["stores"] += 1
+                while self.total_bytes > self.max_bytes:
+                    oldest = self.db.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 16").fetchall()
+                    if not oldest:
+                        self.total_bytes = 0
+                        break
+                    for oldest_key, oldest_size in oldest:
+                        self.delete_locked(oldest_key, oldest_size)
+                        self.stats["evictions"] += 1
+                        if self.total_bytes <= self.max_bytes:
+                            break
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            print(f"[disk-cache] write failed for {key}: {e}")
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "bytes": self.total_bytes, "maxBytes": self.max_bytes, "path": self.path, "shared": self.shared}
+
+
+class ResponseCache:
+    def __init__(self, max_bytes, stale_seconds, disk=None):
+        self.max_bytes = max(0, max_bytes)
+        self.max_entry_bytes = self.max_bytes // 4
+        self.stale_seconds = max(0, stale_seconds)
+        self.disk = disk
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.refreshing = set()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "stores": 0, "evictions": 0, "diskHits": 0, "shedHits": 0}
+
+    def remove_locked(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["size"]
+
+    def insert_locked(self, key, entry):
+        self.remove_locked(key)
+        self.entries[key] = entry
+        self.total_bytes += entry["size"]
+        while self.total_bytes > self.max_bytes and self.entries:
+            evicted_key = next(iter(self.entries))
+            self.remove_locked(evicted_key)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now <= entry["stale_until"]:
+                    state = "fresh" if now <= entry["expires_at"] else "stale"
+                    if state == "fresh" or self.disk is None or not self.disk.shared:
+                        self.entries.move_to_end(key)
+                        self.stats["hits" if state == "fresh" else "stale"] += 1
+                        return entry, state
+                else:
+                    entry = None
+        if self.disk is not None:
+            stale_entry = entry
+            entry = self.disk.load(key)
+            if stale_entry is not None and (entry is None or entry["expires_at"] <= stale_entry["expires_at"]):
+                with self.lock:
+                    self.stats["stale"] += 1
+                return stale_entry, "stale"
+            if entry is not None and entry["size"] <= self.max_entry_bytes:
+                state = "fresh" if now <= entry["expires_at"] else "stale"
+                with self.lock:
+                    self.insert_locked(key, entry)
+                    self.stats["diskHits"] += 1
+                    self.stats["hits" if state == "fresh" else "stale"] += 1
+                return {**entry, "tier": "disk"}, state
+        with self.lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def expires_at(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            expires_at = entry["expires_at"] if entry is not None else None
+        if self.disk is not None and self.disk.shared:
+            disk_expires_at = self.disk.expires_at(key)
+            if disk_expires_at is not None:
+                expires_at = max(expires_at or 0, disk_expires_at)
+        return expires_at
+
+    def peek(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.stats["shedHits"] += 1
+            return entry
+
+    def put(self, key, result, ttl):
+        headers = {k: v for k, v in result["headers"].items() if k.lower() not in UNCACHEABLE_HEADERS}
+        size = len(result["body"]) + sum(len(k) + len(v) for k, v in headers.items())
+        if size > self.max_entry_bytes:
+            return None
+        stored_at = time.time()
+        entry = {
+            "status": result["status"],
+            "headers": headers,
+            "body": result["body"],
+            "source": result.get("source", ""),
+            "stored_at": stored_at,
+            "expires_at": stored_at + ttl,
+            "stale_until": stored_at + ttl + self.stale_seconds,
+            "size": size,
+            "variants": {},
+        }
+        with self.lock:
+            self.insert_locked(key, entry)
+            self.stats["stores"] += 1
+        if self.disk is not None:
+            self.disk.store(key, entry)
+        return entry
+
+    def begin_refresh(self, key):
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        with self.lock:
+            self.refreshing.discard(key)
+
+    def snapshot(self):
+        with self.lock:
+            payload = {
+                **self.stats,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "maxBytes": self.max_bytes,
+                "refreshing": len(self.refreshing),
+            }
+        if self.disk is not None:
+            payload["disk"] = self.disk.snapshot()
+        return payload
+
+
+class SingleFlight:
+    def __init__(self, max_tracked_keys=200):
+        self.max_tracked_keys = max_tracked_keys
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.key_stats = OrderedDict()
+        self.stats = {"fetches": 0, "merged": 0}
+
+    def track_locked(self, key, merged):
+        entry = self.key_stats.pop(key, None) or {"requests": 0, "merged": 0}
+        entry["requests"] += 1
+        if merged:
+            entry["merged"] += 1
+        self.key_stats[key] = entry
+        while len(self.key_stats) > self.max_tracked_keys:
+            self.key_stats.popitem(last=False)
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+                self.stats["fetches"] += 1
+            else:
+                self.stats["merged"] += 1
+            self.track_locked(key, not leader)
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call["event"].set()
+        return call["result"], False
+
+    def snapshot(self, top=10):
+        with self.lock:
+            busiest = sorted(self.key_stats.items(), key=lambda item: item[1]["merged"], reverse=True)[:top]
+            return {
+                **self.stats,
+                "inFlight": len(self.calls),
+                "topMergedKeys": {key: dict(entry) for key, entry in busiest if entry["merged"]},
+            }
+
+
+class ConditionalStore:
+    def __init__(self, max_bytes):
+        self.max_bytes = max(0, max_bytes)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"conditionalRequests": 0, "notModified": 0, "bytesSaved": 0, "stored": 0}
+
+    def lookup(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            self.entries.move_to_end(url)
+            self.stats["conditionalRequests"] += 1
+            return entry
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def remember(self, url, status, headers, body):
+        etag = header_value(headers, "ETag")
+        last_modified = header_value(headers, "Last-Modified")
+        if status != 200 or not (etag or last_modified) or len(body) > self.max_bytes // 4:
+            return
+        entry = {"etag": etag, "last_modified": last_modified, "status": status, "headers": headers, "body": body}
+        with self.lock:
+            previous = self.entries.pop(url, None)
+            if previous is not None:
+                self.total_bytes -= len(previous["body"])
+            self.entries[url] = entry
+            self.total_bytes += len(body)
+            self.stats["stored"] += 1
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted["body"])
+
+    def not_modified(self, url, entry, fresh_headers):
+        headers = dict(entry["headers"])
+        for key, value in fresh_headers.items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                headers[key] = value
+        with self.lock:
+            self.stats["notModified"] += 1
+            self.stats["bytesSaved"] += len(entry["body"])
+            if url in self.entries:
+                self.entries[url] = {**entry, "headers": headers}
+        return headers
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "bytes": self.total_bytes}
+
+
+def is_cacheable_result(result):
+    return bool(result.get("ok")) and result.get("status") == 200
+
+
+def build_response_cache():
+    if not CACHE_ENABLED or CACHE_MAX_BYTES <= 0:
+        return None
+    disk = None
+    if DISK_CACHE_ENABLED and DISK_CACHE_MAX_BYTES > 0:
+        try:
+            disk = DiskCache(DISK_CACHE_PATH, DISK_CACHE_MAX_BYTES, DISK_CACHE_MAX_AGE_SECONDS)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[disk-cache] disabled: {e}")
+    return ResponseCache(CACHE_MAX_BYTES, CACHE_STALE_SECONDS, disk)
+
+
+RESPONSE_CACHE = build_response_cache()
+SINGLE_FLIGHT = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+CONDITIONAL_STORE = ConditionalStore(CONDITIONAL_MAX_BYTES) if CONDITIONAL_REQUESTS_ENABLED and CONDITIONAL_MAX_BYTES > 0 else None
+SOURCE_HEALTH = SourceHealthRegistry(SOURCE_FAILURE_THRESHOLD, SOURCE_COOLDOWN_SECONDS, SOURCE_MAX_COOLDOWN_SECONDS)
+SSL_CONTEXT = build_ssl_context()
+UPSTREAM_POOL = UpstreamConnectionPool(SSL_CONTEXT, UPSTREAM_POOL_MAX_PER_HOST, UPSTREAM_POOL_IDLE_SECONDS, UPSTREAM_LIMITER) if UPSTREAM_POOL_ENABLED and not urllib.request.getproxies() else None
+JINA_SSL_CONTEXT = build_jina_ssl_context()
+JINA_POOL = UpstreamConnectionPool(JINA_SSL_CONTEXT, UPSTREAM_POOL_MAX_PER_HOST, UPSTREAM_POOL_IDLE_SECONDS, UPSTREAM_LIMITER) if UPSTREAM_POOL is not None else None
+
+
+def is_html_like(content_type, body_text):
+    lowered_type = (content_type or "").lower()
+    if "text/html" in lowered_type:
+        return True
+    sample = body_text[:600].lower()
+    return "<!doctype html" in sample or "<html" in sample
+
+
+def has_challenge_markers(body_text, markers):
+    lowered = body_text[:VALIDATION_PREFIX_BYTES].lower()
+    return any(marker in lowered for marker in markers)
+
+
+def validate_nitter_payload(content_type, body_text):
+    if not body_text:
+        return False
+    has_rss = "<rss" in body_text or "<channel" in body_text or "<feed" in body_text
+    if has_rss:
+        return not has_challenge_markers(body_text, NITTER_CHALLENGE_MARKERS)
+    return False
+
+
+def validate_redlib_payload(content_type, body_text):
+    if not body_text:
+        return False
+    if is_html_like(content_type, body_text):
+        return False
+    if has_challenge_markers(body_text, REDLIB_CHALLENGE_MARKERS):
+        return False
+    try:
+        payload = json.loads(body_text)
+    except json.JSONDecodeError:
+        return False
+    data = payload.get("data")
+    return payload.get("kind") == "Listing" and isinstance(data, dict) and isinstance(data.get("children"), list)
+
+
+def validate_nitter_prefix(content_type, prefix_text):
+    return validate_nitter_payload(content_type, prefix_text[:VALIDATION_PREFIX_BYTES])
+
+
+def validate_redlib_prefix(content_type, prefix_text):
+    sample = prefix_text[:VALIDATION_PREFIX_BYTES]
+    if not sample.lstrip().startswith("{"):
+        return False
+    if is_html_like(content_type, sample) or has_challenge_markers(sample, REDLIB_CHALLENGE_MARKERS):
+        return False
+    return REDLIB_LISTING_KIND.search(sample) is not None and REDLIB_LISTING_CHILDREN.search(sample) is not None
+
+
+HEALTH_PROBES = (
+    ("nitter", NITTER_ENABLED, NITTER_SOURCES, "/search/rss?q=privacy", validate_nitter_payload, "application/rss+xml, application/xml, text/xml, */*"),
+    ("redlib", REDLIB_ENABLED, REDLIB_SOURCES, "/r/popular.json?limit=1&raw_json=1", validate_redlib_payload, "application/json, text/plain, */*"),
+)
+
+
+def network_details(network_name, enabled, sources):
+    details = {
+        "enabled": enabled,
+        "sources": len(sources),
+        "selfHostedSources": len([s for s in sources if s in (NITTER_SELF_HOSTED if network_name == "nitter" else REDLIB_SELF_HOSTED)]),
+    }
+    if not enabled:
+        details["ok"] = False
+        details["reason"] = "disabled"
+    elif not sources:
+        details["ok"] = False
+        details["reason"] = "no sources configured"
+    return details
+
+
+def parse_timestamp_ms(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def strip_html(text, limit):
+    cleaned = re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", text or "")).strip()
+    return cleaned[:limit]
+
+
+def xml_local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def feed_item_from_element(element):
+    item = {"title": "", "link": "", "id": "", "published": None, "description": "", "author": "", "media": []}
+    for child in element:
+        name = xml_local_name(child.tag)
+        text = "".join(child.itertext()).strip()
+        if name == "link":
+            href = child.get("href")
+            if href is None:
+                item["link"] = item["link"] or text
+            elif child.get("rel", "alternate") == "alternate":
+                item["link"] = item["link"] or href
+            elif child.get("rel") == "enclosure" and (child.get("type") or "").startswith(("image", "video")):
+                item["media"].append({"type": "video" if child.get("type").startswith("video") else "image", "url": href})
+        elif name in ("enclosure", "content", "thumbnail") and child.get("url"):
+            media_type = child.get("type") or child.get("medium") or "image"
+            if media_type.startswith(("image", "video")):
+                item["media"].append({"type": "video" if media_type.startswith("video") else "image", "url": child.get("url")})
+        elif name == "title":
+            item["title"] = item["title"] or text
+        elif name in ("guid", "id"):
+            item["id"] = item["id"] or text
+        elif name in ("pubDate", "published", "updated", "date"):
+            item["published"] = item["published"] or parse_timestamp_ms(text)
+        elif name in ("description", "summary", "content", "encoded"):
+            item["description"] = item["description"] or text
+        elif name in ("creator", "author"):
+            author_name = next((grandchild.text for grandchild in child if xml_local_name(grandchild.tag) == "name"), None)
+            item["author"] = item["author"] or (author_name or text).strip()
+    item["id"] = item["id"] or item["link"]
+    return item
+
+
+def parse_feed(chunks):
+    parser = ElementTree.XMLPullParser(events=("end",))
+    items = []
+    root = None
+
+    def drain():
+        nonlocal root
+        for _, element in parser.read_events():
+            root = element
+            if xml_local_name(element.tag) in ("item", "entry"):
+                items.append(feed_item_from_element(element))
+                element.clear()
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        drain()
+    parser.close()
+    drain()
+    feed = {"title": "", "link": "", "items": items}
+    if root is not None:
+        container = next((child for child in root if xml_local_name(child.tag) == "channel"), root)
+        for child in container:
+            name = xml_local_name(child.tag)
+            if name == "title" and not feed["title"]:
+                feed["title"] = "".join(child.itertext()).strip()
+            elif name == "link" and not feed["link"]:
+                if child.get("href") is None:
+                    feed["link"] = "".join(child.itertext()).strip()
+                elif child.get("rel", "alternate") == "alternate":
+                    feed["link"] = child.get("href")
+    return feed
+
+
+def parse_feed_xml(body):
+    return parse_feed([body])["items"]
+
+
+def iter_decoded_chunks(headers, upstream_stream, body):
+    encoding = (header_value(headers, "Content-Encoding") or "identity").strip().lower()
+    if upstream_stream is None:
+        yield decode_body(body, encoding)
+        return
+    transform = None
+    if encoding != "identity":
+        transform = stream_decoder(encoding)
+        if transform is None:
+            raise ValueError(f"unsupported content encoding: {encoding}")
+    while True:
+        chunk = upstream_stream.read_chunk()
+        if not chunk:
+            break
+        yield transform[0](chunk) if transform else chunk
+    if transform is not None:
+        yield transform[1]()
+
+
+def feed_item_media(item):
+    media = list(item["media"])
+    if not media:
+        image = FEED_IMAGE_SRC.search(item["description"])
+        if image:
+            media.append({"type": "image", "url": image.group(1), "previewUrl": image.group(1)})
+    video = FEED_VIDEO_SRC.search(item["description"])
+    if video:
+        media.append({"type": "video", "url": video.group(1)})
+    elif re.search(r"\.(mp4|webm|mov|mkv)$", item["link"], re.IGNORECASE):
+        media.append({"type": "video", "url": item["link"]})
+    return media
+
+
+def feed_item_content(item):
+    summary = strip_html(item["description"], 280)
+    title = html.escape(item["title"] or "No Title")
+    return f"<strong>{title}</strong>" + (f'<p class="mt-1 text-zinc-400">{html.escape(summary)}</p>' if summary else "")
+
+
+def normalize_rss_posts(body, target_url):
+    posts = []
+    for item in parse_feed_xml(body)[:FEED_ITEMS_PER_TARGET]:
+        parsed_link = urlparse(item["link"] or target_url)
+        feed_host = parsed_link.hostname or urlparse(target_url).hostname or "rss"
+        posts.append({
+            "id": f"rss-{item['id']}",
+            "source": "rss",
+            "author": {
+                "name": feed_host,
+                "handle": "rss",
+                "avatar": f"https://api.dicebear.com/7.x/initials/svg?seed={feed_host}",
+                "url": f"{parsed_link.scheme or 'https'}://{parsed_link.netloc or feed_host}",
+            },
+            "content": feed_item_content(item),
+            "media": feed_item_media(item),
+            "url": item["link"],
+            "timestamp": item["published"],
+        })
+    return posts
+
+
+def normalize_lemmy_posts(body, target_url, source="lemmy", id_prefix="lemmy"):
+    instance = urlparse(target_url)
+    posts = []
+    for item in parse_feed_xml(body)[:FEED_ITEMS_PER_TARGET]:
+        creator = item["author"] or "Lemmy User"
+        author, author_host, author_url = creator, instance.hostname, f"{instance.scheme}://{instance.netloc}/u/{creator}"
+        creator_match = re.match(r"https?://([^/]+)/u/(.+)", creator)
+        if creator_match:
+            author_host, author = creator_match.group(1), creator_match.group(2)
+            author_url = creator
+        posts.append({
+            "id": f"{id_prefix}-{item['id']}",
+            "source": source,
+            "author": {
+                "name": author,
+                "handle": f"@{author}@{author_host}",
+                "avatar": f"https://api.dicebear.com/7.x/identicon/svg?seed={author}",
+                "url": author_url,
+            },
+            "content": feed_item_content(item),
+            "media": feed_item_media(item),
+            "url": item["link"],
+            "timestamp": item["published"],
+        })
+    return posts
+
+
+def normalize_piefed_posts(body, target_url):
+    return normalize_lemmy_posts(body, target_url, source="piefed", id_prefix="pf")
+
+
+def normalize_nitter_posts(body, target_url):
+    posts = []
+    for item in parse_feed_xml(body)[:FEED_ITEMS_PER_TARGET]:
+        author = (item["author"] or "").lstrip("@") or "unknown"
+        posts.append({
+            "id": f"nitter-{item['id']}",
+            "source": "nitter",
+            "author": {
+                "name": author,
+                "handle": f"@{author}",
+                "avatar": f"https://api.dicebear.com/7.x/identicon/svg?seed={author}",
+                "url": f"https://x.com/{author}",
+            },
+            "content": item["description"] or html.escape(item["title"]),
+            "media": feed_item_media(item),
+            "url": item["link"],
+            "timestamp": item["published"],
+        })
+    return posts
+
+
+def reddit_post_media(post):
+    media = []
+    preview = ((post.get("preview") or {}).get("images") or [None])[0]
+    image_url = post.get("url_overridden_by_dest") or ""
+    thumbnail = post.get("thumbnail") if post.get("thumbnail") not in (None, "", "self", "default", "nsfw") else None
+    if preview and (preview.get("source") or {}).get("url"):
+        resolutions = preview.get("resolutions") or []
+        middle = next((r for r in resolutions if r.get("width", 0) >= 640), resolutions[-1] if resolutions else None)
+        source_url = preview["source"]["url"].replace("&amp;", "&")
+        media.append({"type": "image", "url": source_url, "previewUrl": middle["url"].replace("&amp;", "&") if middle else source_url})
+    elif re.search(r"\.(jpg|jpeg|png|gif|webp)$", image_url, re.IGNORECASE):
+        media.append({"type": "image", "url": image_url})
+    elif post.get("is_video") and ((post.get("media") or {}).get("reddit_video") or {}).get("fallback_url"):
+        media.append({"type": "video", "url": post["media"]["reddit_video"]["fallback_url"], "previewUrl": thumbnail})
+    elif post.get("is_gallery") and post.get("media_metadata"):
+        for entry in list(post["media_metadata"].values())[:4]:
+            if entry.get("status") == "valid" and (entry.get("s") or {}).get("u"):
+                previews = entry.get("p") or []
+                media.append({
+                    "type": "image",
+                    "url": entry["s"]["u"].replace("&amp;", "&"),
+                    "previewUrl": previews[-1]["u"].replace("&amp;", "&") if previews and previews[-1].get("u") else None,
+                })
+    return media
+
+
+def normalize_reddit_posts(body, target_url):
+    listing = json.loads(body)
+    posts = []
+    for child in ((listing.get("data") or {}).get("children") or [])[:FEED_ITEMS_PER_TARGET]:
+        if child.get("kind") != "t3":
+            continue
+        post = child.get("data") or {}
+        author = post.get("author") or "deleted"
+        selftext = post.get("selftext") or ""
+        summary = f"<p>{html.escape(selftext[:300])}{'…' if len(selftext) > 300 else ''}</p>" if selftext else ""
+        posts.append({
+            "id": post.get("id"),
+            "source": "reddit",
+            "author": {
+                "name": author,
+                "handle": f"u/{author} · r/{post.get('subreddit')}",
+                "avatar": f"https://api.dicebear.com/7.x/identicon/svg?seed={post.get('author') or post.get('subreddit')}",
+                "url": f"https://www.reddit.com/u/{author}",
+            },
+            "content": f"<strong>{html.escape(post.get('title') or '')}</strong>{summary}",
+            "media": reddit_post_media(post),
+            "url": f"https://www.reddit.com{post.get('permalink') or ''}",
+            "timestamp": int((post.get("created_utc") or 0) * 1000),
+        })
+    return posts
+
+
+def normalize_mastodon_posts(body, target_url):
+    statuses = json.loads(body)
+    if not isinstance(statuses, list):
+        raise ValueError("unexpected mastodon response")
+    posts = []
+    for status in statuses[:FEED_ITEMS_PER_TARGET]:
+        account = status.get("account") or {}
+        posts.append({
+            "id": status.get("id"),
+            "source": "mastodon",
+            "author": {
+                "name": account.get("display_name") or account.get("username") or "Unknown",
+                "handle": f"@{account.get('acct') or 'unknown'}",
+                "avatar": account.get("avatar") or f"https://api.dicebear.com/7.x/bottts/svg?seed={status.get('id')}",
+                "url": account.get("url") or "",
+            },
+            "content": status.get("content") or "",
+            "media": [
+                {"type": "video" if attachment.get("type") == "video" else "image", "url": attachment.get("url"), "previewUrl": attachment.get("preview_url")}
+                for attachment in status.get("media_attachments") or []
+            ],
+            "url": status.get("url") or "",
+            "timestamp": parse_timestamp_ms(status.get("created_at")),
+        })
+    return posts
+
+
+def bluesky_embed_media(embed):
+    embed_type = (embed or {}).get("$type")
+    if embed_type == "app.bsky.embed.images#view":
+        return [{"type": "image", "url": image.get("fullsize"), "previewUrl": image.get("thumb")} for image in embed.get("images") or []]
+    if embed_type == "app.bsky.embed.video#view":
+        return [{"type": "video", "url": embed.get("playlist"), "previewUrl": embed.get("thumbnail")}]
+    if embed_type == "app.bsky.embed.recordWithMedia#view":
+        return bluesky_embed_media(embed.get("media"))
+    return []
+
+
+def normalize_bluesky_posts(body, target_url):
+    feed = json.loads(body).get("feed")
+    if not isinstance(feed, list):
+        raise ValueError("unexpected bluesky response")
+    posts = []
+    for entry in feed[:FEED_ITEMS_PER_TARGET]:
+        post = entry.get("post") or {}
+        author = post.get("author") or {}
+        handle = author.get("handle") or ""
+        uri = post.get("uri") or ""
+        posts.append({
+            "id": uri,
+            "source": "bluesky",
+            "author": {
+                "name": author.get("displayName") or handle,
+                "handle": handle,
+                "avatar": author.get("avatar") or f"https://api.dicebear.com/7.x/bottts/svg?seed={handle}",
+                "url": f"https://bsky.app/profile/{handle}",
+            },
+            "content": (post.get("record") or {}).get("text") or "",
+            "media": bluesky_embed_media(post.get("embed")),
+            "url": f"https://bsky.app/profile/{handle}/post/{uri.rsplit('/', 1)[-1]}",
+            "timestamp": parse_timestamp_ms(post.get("indexedAt")),
+        })
+    return posts
+
+
+def normalize_misskey_posts(body, target_url):
+    notes = json.loads(body)
+    if not isinstance(notes, list):
+        raise ValueError("unexpected misskey response")
+    instance = urlparse(target_url)
+    origin = f"{instance.scheme}://{instance.netloc}"
+    posts = []
+    for note in notes[:FEED_ITEMS_PER_TARGET]:
+        target = note.get("renote") or note
+        files = [f for f in target.get("files") or [] if (f.get("type") or "").startswith(("image/", "video/"))]
+        if not target.get("text") and not files:
+            continue
+        user = target.get("user") or {}
+        posts.append({
+            "id": target.get("id"),
+            "source": "misskey",
+            "author": {
+                "name": user.get("name") or user.get("username") or "Misskey User",
+                "handle": f"@{user.get('username') or 'unknown'}@{instance.netloc}",
+                "avatar": user.get("avatarUrl") or f"https://api.dicebear.com/7.x/bottts/svg?seed={target.get('id')}",
+                "url": f"{origin}/@{user.get('username') or ''}",
+            },
+            "content": target.get("text") or "",
+            "media": [
+                {
+                    "type": "video" if f["type"].startswith("video/") else "image",
+                    "url": f.get("url") or f.get("thumbnailUrl"),
+                    "previewUrl": f.get("thumbnailUrl") or f.get("url"),
+                }
+                for f in files[:4]
+            ],
+            "url": f"{origin}/notes/{target.get('id')}",
+            "timestamp": parse_timestamp_ms(note.get("createdAt")),
+        })
+    return posts
+
+
+FEED_NETWORKS = {
+    "reddit": ("redlib", normalize_reddit_posts),
+    "mastodon": ("get", normalize_mastodon_posts),
+    "bluesky": ("get", normalize_bluesky_posts),
+    "lemmy": ("get", normalize_lemmy_posts),
+    "piefed": ("get", normalize_piefed_posts),
+    "misskey": ("post", normalize_misskey_posts),
+    "rss": ("get", normalize_rss_posts),
+    "nitter": ("nitter", normalize_nitter_posts),
+}
+
+
+def proxy_prefix_for(target_url):
+    for prefix, base in PROXIES.items():
+        if target_url.startswith(base + "/"):
+            return prefix
+    return "/api/proxy"
+
+
+def feed_target_ttl(target_url):
+    return cache_ttl_for(proxy_prefix_for(target_url))
+
+
+def feed_sort_key(post):
+    return post["timestamp"], str(post["id"])
+
+
+def parse_feed_cursor(raw):
+    timestamp, _, post_id = (raw or "").partition(":")
+    try:
+        return int(timestamp), post_id
+    except ValueError:
+        return None
+
+
+REDDIT_POST_FIELDS = [
+    "id",
+    "title",
+    "author",
+    "subreddit",
+    "permalink",
+    "created_utc",
+    "selftext",
+    "url_overridden_by_dest",
+    "thumbnail",
+    "is_video",
+    "is_gallery",
+    "media.reddit_video.fallback_url",
+    "preview.images.source.url",
+    "preview.images.resolutions.url",
+    "preview.images.resolutions.width",
+    "media_metadata.*.status",
+    "media_metadata.*.s.u",
+    "media_metadata.*.p.u",
+]
+
+MASTODON_STATUS_FIELDS = [
+    "id",
+    "content",
+    "url",
+    "created_at",
+    "account.display_name",
+    "account.username",
+    "account.acct",
+    "account.avatar",
+    "account.url",
+    "media_attachments.type",
+    "media_attachments.url",
+    "media_attachments.preview_url",
+]
+
+
+def build_projection(paths):
+    spec = {}
+    for path in paths:
+        parts = [part for part in path.strip().split(".") if part]
+        node = spec
+        for index, part in enumerate(parts):
+            if index == len(parts) - 1:
+                node[part] = True
+                break
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+    return spec
+
+
+def project_value(value, spec):
+    if spec is True:
+        return value
+    if isinstance(value, list):
+        return [project_value(item, spec) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "*" in spec:
+        return {key: project_value(item, spec["*"]) for key, item in value.items()}
+    return {key: project_value(value[key], sub_spec) for key, sub_spec in spec.items() if key in value}
+
+
+def project_reddit_listing(payload, spec):
+    if isinstance(payload, list):
+        projected = [project_reddit_listing(item, spec) for item in payload]
+        if all(item is None for item in projected):
+            return None
+        return [new if new is not None else old for new, old in zip(projected, payload)]
+    if not isinstance(payload, dict) or payload.get("kind") != "Listing" or not isinstance(payload.get("data"), dict):
+        return None
+    data = payload["data"]
+    children = []
+    for child in data.get("children") or []:
+        if isinstance(child, dict) and child.get("kind") == "t3":
+            child = {"kind": "t3", "data": project_value(child.get("data") or {}, spec)}
+        children.append(child)
+    envelope = {key: data[key] for key in ("after", "before", "dist") if key in data}
+    return {"kind": "Listing", "data": {**envelope, "children": children}}
+
+
+def project_mastodon_statuses(payload, spec):
+    if isinstance(payload, dict) and "account" in payload and "content" in payload:
+        return project_value(payload, spec)
+    if isinstance(payload, list) and payload and all(isinstance(item, dict) and "account" in item for item in payload):
+        return [project_value(item, spec) for item in payload]
+    return None
+
+
+PROJECTION_RULES = {
+    "/api/reddit": (project_reddit_listing, build_projection(REDDIT_POST_FIELDS)),
+    "/api/redlib": (project_reddit_listing, build_projection(REDDIT_POST_FIELDS)),
+    "/api/mastodon": (project_mastodon_statuses, build_projection(MASTODON_STATUS_FIELDS)),
+}
+
+
+class ProjectionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {"projected": 0, "skipped": 0, "bytesIn": 0, "bytesOut": 0}
+
+    def record(self, bytes_in, bytes_out):
+        with self.lock:
+            self.stats["projected"] += 1
+            self.stats["bytesIn"] += bytes_in
+            self.stats["bytesOut"] += bytes_out
+
+    def skip(self):
+        with self.lock:
+            self.stats["skipped"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "bytesSaved": self.stats["bytesIn"] - self.stats["bytesOut"]}
+
+
+PROJECTION_STATS = ProjectionStats()
+
+
+def apply_projection(result, projector, spec):
+    if not is_cacheable_result(result):
+        return result
+    headers = result["headers"]
+    try:
+        body = decode_body(result["body"], header_value(headers, "Content-Encoding"))
+        projected = projector(json.loads(body), spec)
+    except (OSError, ValueError, zlib.error):
+        projected = None
+    if projected is None:
+        PROJECTION_STATS.skip()
+        return result
+    projected_body = json.dumps(projected, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    PROJECTION_STATS.record(len(body), len(projected_body))
+    headers = {key: value for key, value in headers.items() if key.lower() not in ("content-encoding", "etag")}
+    headers["X-Projection-Bytes-Saved"] = str(len(body) - len(projected_body))
+    return {**result, "headers": headers, "body": projected_body}
+
+
+def projected_fetcher(fetcher, prefix, spec=None):
+    if prefix not in PROJECTION_RULES:
+        return fetcher
+    projector, default_spec = PROJECTION_RULES[prefix]
+    if spec is None:
+        if not PROJECTION_ENABLED:
+            return fetcher
+        spec = default_spec
+    return lambda: apply_projection(fetcher(), projector, spec)
+
+
+def default_projection_key(prefix):
+    return "#fields=default" if prefix in PROJECTION_RULES and PROJECTION_ENABLED else ""
+
+
+def route_matches(route_path, prefix):
+    return route_path == prefix or route_path.startswith(prefix + "/")
+
+
+def proxy_route_for(route_path):
+    matches = [prefix for prefix in PROXIES if route_matches(route_path, prefix)]
+    return max(matches, key=len) if matches else None
+
+
+def route_label(route_path):
+    if route_matches(route_path, "/api/proxy/batch"):
+        return "batch"
+    for name in ("proxy", "nitter", "redlib", "healthz", "feed", "metrics"):
+        if route_matches(route_path, f"/api/{name}"):
+            return name
+    prefix = proxy_route_for(route_path)
+    if prefix is not None:
+        return prefix[len("/api/"):]
+    return "static"
+
+
+def source_origin(target_url):
+    parsed = urlparse(target_url)
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.netloc else "unknown"
+
+
+def metric_labels(labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped))
+
+
+def metric_name(key):
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
+
+
+class ProxyMetrics:
+    def __init__(self, buckets, max_sources):
+        self.buckets = buckets
+        self.max_sources = max(1, max_sources)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.sources = set()
+        self.started = time.time()
+
+    def inc_locked(self, name, labels):
+        key = (name, tuple(labels.items()))
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def observe_locked(self, name, labels, seconds):
+        key = (name, tuple(labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[0][index] += 1
+                break
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def source_label_locked(self, source):
+        if source in self.sources:
+            return source
+        if len(self.sources) >= self.max_sources:
+            return "other"
+        self.sources.add(source)
+        return source
+
+    def record_request(self, route, outcome, seconds, phases):
+        with self.lock:
+            self.inc_locked("requests_total", {"route": route, "outcome": outcome})
+            self.observe_locked("request_duration_seconds", {"route": route}, seconds)
+            for phase, phase_seconds in phases:
+                self.observe_locked("request_phase_seconds", {"route": route, "phase": phase}, phase_seconds)
+
+    def record_upstream(self, source, outcome, seconds):
+        with self.lock:
+            source = self.source_label_locked(source)
+            self.inc_locked("upstream_requests_total", {"source": source, "outcome": outcome})
+            self.observe_locked("upstream_duration_seconds", {"source": source}, seconds)
+
+    def render(self, gauges):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self.histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE social_portal_{name} counter")
+            lines.append(f"social_portal_{name}{{{metric_labels(dict(labels))}}} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE social_portal_{name} histogram")
+            label_text = metric_labels(dict(labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                cumulative += bucket_count
+                lines.append(f'social_portal_{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'social_portal_{name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"social_portal_{name}_sum{{{label_text}}} {total:.6f}")
+            lines.append(f"social_portal_{name}_count{{{label_text}}} {count}")
+        gauges = {"uptime_seconds": round(time.time() - self.started, 1), **gauges}
+        for name, value in gauges.items():
+            lines.append(f"# TYPE social_portal_{name} gauge")
+            lines.append(f"social_portal_{name} {value}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+METRICS = ProxyMetrics(METRICS_LATENCY_BUCKETS, METRICS_MAX_SOURCES) if METRICS_ENABLED else None
+
+
+def record_upstream(source, outcome, started):
+    if METRICS is not None:
+        METRICS.record_upstream(source, outcome, time.monotonic() - started)
+
+
+def upstream_outcome(result):
+    if result.get("busy"):
+        return "shed"
+    if result.get("ok") is False:
+        return "http_error" if result.get("status", 500) != 500 else "error"
+    return "success" if 200 <= result.get("status", 200) < 400 else "http_error"
+
+
+class FeedFetches:
+    # At most one fetch per feed target runs at a time. A request that needs a target
+    # whose fetch is still running, possibly one an earlier request gave up on at its
+    # deadline, waits for that fetch instead of starting another thread, and the total
+    # number of running fetches is capped.
+    def __init__(self, max_outstanding):
+        self.max_outstanding = max(1, max_outstanding)
+        self.lock = threading.Lock()
+        self.running = {}
+        self.stats = {"started": 0, "joined": 0, "rejected": 0}
+
+    def submit(self, key, fetch, results, tag):
+        with self.lock:
+            waiters = self.running.get(key)
+            if waiters is not None:
+                waiters.append((results, tag))
+                self.stats["joined"] += 1
+                return True
+            if len(self.running) >= self.max_outstanding:
+                self.stats["rejected"] += 1
+                return False
+            self.running[key] = [(results, tag)]
+            self.stats["started"] += 1
+        threading.Thread(target=self.run, args=(key, fetch), daemon=True).start()
+        return True
+
+    def run(self, key, fetch):
+        try:
+            outcome = fetch()
+        except Exception as e:
+            outcome = {"ok": False, "error": str(e)}
+        with self.lock:
+            waiters = self.running.pop(key, [])
+        for results, tag in waiters:
+            results.put((tag, outcome))
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "running": len(self.running), "maxOutstanding": self.max_outstanding}
+
+
+FEED_FETCHES = FeedFetches(FEED_MAX_OUTSTANDING)
+
+
+def discard_attempt(result):
+    stream = result.get("stream")
+    if stream is not None:
+        stream.close()
+
+
+class SPAHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    timeout = KEEPALIVE_IDLE_SECONDS if KEEPALIVE_IDLE_SECONDS > 0 else None
+
+    def __init__(self, *args, **kwargs):
+        self.requests_handled = 0
+        self.timing = None
+        super().__init__(*args, directory=DIST_DIR, **kwargs)
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self.wait_for_next_request():
+            self.handle_one_request()
+
+    def wait_for_next_request(self):
+        # A pool worker must not sit on an idle keep-alive socket while accepted
+        # connections queue up: poll in short slices and give the worker back as
+        # soon as someone else is waiting for one.
+        pending = getattr(self.server, "pending", None)
+        if pending is None:
+            return True
+        self.connection.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while True:
+            wait = KEEPALIVE_POLL_SECONDS
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            readable, _, _ = select.select([self.connection], [], [], wait)
+            if readable:
+                return True
+            if not pending.empty():
+                return False
+
+    def handle_one_request(self):
+        self.timing = RequestTiming()
+        self.response_status = None
+        self.cache_status = None
+        self.path = ""
+        self.headers = None
+        REQUEST_TIMING.current = self.timing
+        try:
+            super().handle_one_request()
+        finally:
+            REQUEST_TIMING.current = None
+            if self.response_status is not None and not self.is_prefetch():
+                if CACHE_WARMER is not None:
+                    CACHE_WARMER.touch()
+                if HEALTH_MONITOR is not None:
+                    HEALTH_MONITOR.touch()
+            if METRICS is not None and self.response_status is not None:
+                METRICS.record_request(
+                    route_label(urlparse(getattr(self, "path", "") or "").path),
+                    self.request_outcome(),
+                    time.monotonic() - self.timing.started,
+                    self.timing.entries,
+                )
+
+    def is_prefetch(self):
+        if self.headers is None:
+            return False
+        return self.headers.get(PREFETCH_HEADER) == "1" and self.client_address[0] in ("127.0.0.1", "::1")
+
+    def request_outcome(self):
+        if self.cache_status in ("HIT", "STALE"):
+            return "cache_hit"
+        if self.timing.outcome is not None:
+            return self.timing.outcome
+        if self.response_status >= 400:
+            return "http_error"
+        return "success"
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword == "X-Cache":
+            self.cache_status = value
+        super().send_header(keyword, value)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        route_path = parsed.path
+
+        if route_path == "/api/proxy/batch":
+            self.handle_proxy_batch(parse_qs(parsed.query).get("url") or [])
+            return
+
+        if route_path == "/api/proxy":
+            params = parse_qs(parsed.query)
+            if "url" not in params:
+                self.send_error(400, "Missing url query parameter")
+                return
+            self.handle_proxy_direct(params["url"][0], self.wants_feed_json(parse_qsl(parsed.query)))
+            return
+
+        if route_path.startswith("/api/nitter"):
+            self.handle_network_bridge(
+                route_path=route_path,
+                query=parsed.query,
+                prefix="/api/nitter",
+                network_name="nitter",
+                enabled=NITTER_ENABLED,
+                sources=NITTER_SOURCES,
+                validator=validate_nitter_payload,
+                stream_validator=validate_nitter_prefix,
+                accept_header="application/rss+xml, application/xml, text/xml, */*",
+                fallback_sources=NITTER_PUBLIC,
+                fallback_content_type="application/rss+xml; charset=utf-8",
+                feed_json_allowed=True,
+            )
+            return
+
+        if route_path.startswith("/api/redlib"):
+            self.handle_network_bridge(
+                route_path=route_path,
+                query=parsed.query,
+                prefix="/api/redlib",
+                network_name="redlib",
+                enabled=REDLIB_ENABLED,
+                sources=REDLIB_SOURCES,
+                validator=validate_redlib_payload,
+                stream_validator=validate_redlib_prefix,
+                accept_header="application/json, text/plain, */*",
+                fallback_sources=REDLIB_PUBLIC,
+                fallback_content_type="application/json; charset=utf-8",
+            )
+            return
+
+        if route_path == "/api/healthz":
+            self.handle_healthz()
+            return
+
+        if route_path == "/api/metrics":
+            self.handle_metrics()
+            return
+
+        if route_path == "/api/feed":
+            self.handle_feed(parsed.query)
+            return
+
+        prefix = proxy_route_for(route_path)
+        if prefix is not None:
+            self.handle_proxy(PROXIES[prefix], prefix)
+            return
+
+        if STATIC_INDEX is not None:
+            self.serve_static(route_path)
+            return
+
+        path = self.translate_path(self.path)
+        if not os.path.exists(path) or os.path.isdir(path):
+            if not os.path.exists(path):
+                self.path = "/index.html"
+
+        super().do_GET()
+
+    def do_HEAD(self):
+        route_path = urlparse(self.path).path
+        if STATIC_INDEX is not None and not route_path.startswith("/api/"):
+            self.serve_static(route_path, head_only=True)
+            return
+        super().do_HEAD()
+
+    def serve_static(self, route_path, head_only=False):
+        static_file = STATIC_INDEX.lookup(unquote(route_path))
+        if static_file is None:
+            self.send_error(404, "File not found")
+            return
+        accepted = parse_accept_encoding(self.headers.get("Accept-Encoding"))
+        encoding = next((name for name in ("br", "gzip") if name in static_file.variants and name in accepted), None)
+        etag = static_file.variant_etag(encoding)
+        if etag_matches(self.headers.get("If-None-Match"), (etag, static_file.etag)):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", static_file.cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        body = static_file.variants[encoding] if encoding else static_file.body
+        size = len(body) if body is not None else static_file.size
+        self.send_response(200)
+        self.send_header("Content-Type", static_file.content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", static_file.cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if head_only:
+            return
+        if body is not None:
+            self.wfile.write(body)
+            return
+        with open(static_file.fs_path, "rb") as f:
+            self.connection.sendfile(f, 0, size)
+
+    def should_close_connection(self):
+        if not getattr(self.server, "supports_keep_alive", True):
+            return True
+        if KEEPALIVE_MAX_REQUESTS > 0 and self.requests_handled >= KEEPALIVE_MAX_REQUESTS:
+            return True
+        pending = getattr(self.server, "pending", None)
+        return pending is not None and not pending.empty()
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, User-Agent")
+        if SERVER_TIMING_ENABLED and self.timing is not None:
+            self.send_header("Server-Timing", self.timing.header(self.cache_status))
+        self.requests_handled += 1
+        if not self.close_connection:
+            if self.should_close_connection():
+                self.send_header("Connection", "close")
+            elif self.timeout and KEEPALIVE_MAX_REQUESTS > 0:
+                self.send_header("Keep-Alive", f"timeout={int(self.timeout)}, max={KEEPALIVE_MAX_REQUESTS - self.requests_handled}")
+        super().end_headers()
+
+    def do_POST(self):
+        route_path = urlparse(self.path).path
+        if route_path != "/api/proxy/batch":
+            self.send_error(501, f"Unsupported method ({self.command!r})")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > BATCH_MAX_REQUEST_BYTES:
+            self.close_connection = True
+            self.send_error(413, "Batch request body too large")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            self.send_error(400, "Batch request body must be JSON")
+            return
+        urls = payload.get("urls") if isinstance(payload, dict) else payload
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            self.send_error(400, "Expected a JSON list of urls or {\"urls\": [...]}")
+            return
+        self.handle_proxy_batch(urls)
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def upstream_request_headers(self, target_url, accept_header):
+        headers = {
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": accept_header,
+            "Accept-Language": "en-US,en;q=0.5",
+            "Accept-Encoding": UPSTREAM_ACCEPT_ENCODING,
         }
+        validators = CONDITIONAL_STORE.lookup(target_url) if CONDITIONAL_STORE is not None else None
+        if validators is not None:
+            headers.update(CONDITIONAL_STORE.conditional_headers(validators))
+        return headers, validators
+
+    def open_url(self, target_url, accept_header, timeout_seconds, cancel_token=None):
+        if UPSTREAM_POOL is None:
+            status_code, headers, body = self.request_url(target_url, accept_header, timeout_seconds, cancel_token, decode=False)
+            return {"status": status_code, "headers": headers, "body": body}
+        headers, validators = self.upstream_request_headers(target_url, accept_header)
+        try:
+            stream = UPSTREAM_POOL.open(target_url, headers, timeout_seconds, cancel_token)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and validators is not None:
+                merged_headers = CONDITIONAL_STORE.not_modified(target_url, validators, dict(e.headers.items()))
+                return {"status": validators["status"], "headers": merged_headers, "body": validators["body"]}
+            raise
+        return {"status": stream.status, "headers": stream.headers, "stream": stream}
+
+    def request_url(self, target_url, accept_header, timeout_seconds, cancel_token=None, decode=True):
+        headers, validators = self.upstream_request_headers(target_url, accept_header)
+        try:
+            status_code, response_headers, body = self.request_upstream(target_url, headers, timeout_seconds, cancel_token)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and validators is not None:
+                merged_headers = CONDITIONAL_STORE.not_modified(target_url, validators, dict(e.headers.items()))
+                status_code, response_headers, body = validators["status"], merged_headers, validators["body"]
+            else:
+                raise
+        else:
+            if CONDITIONAL_STORE is not None:
+                CONDITIONAL_STORE.remember(target_url, status_code, response_headers, body)
+        encoding = header_value(response_headers, "Content-Encoding")
+        if decode and encoding and encoding.strip().lower() != "identity":
+            body = decode_body(body, encoding)
+            response_headers = {k: v for k, v in response_headers.items() if k.lower() != "content-encoding"}
+        return status_code, response_headers, body
+
+    def request_upstream(self, target_url, headers, timeout_seconds, cancel_token=None, method="GET", data=None):
+        if UPSTREAM_POOL is not None:
+            return UPSTREAM_POOL.request(target_url, headers, timeout_seconds, cancel_token, method, data)
+        req = urllib.request.Request(target_url, data=data, headers=headers, method=method)
+        timeout_seconds = max(split_timeout(timeout_seconds))
+        with upstream_slot(target_url, timeout_seconds):
+            request_started = time.monotonic()
+            with urllib.request.urlopen(req, timeout=timeout_seconds, context=SSL_CONTEXT) as response:
+                record_timing("ttfb", time.monotonic() - request_started)
+                body = response.read()
+                return response.status, dict(response.headers.items()), body
+
+    def negotiate_encoding(self, headers, body, variants=None):
+        source_encoding = (header_value(headers, "Content-Encoding") or "identity").strip().lower()
+        accepted = parse_accept_encoding(self.headers.get("Accept-Encoding"))
+        if source_encoding != "identity":
+            if source_encoding in accepted:
+                return body, source_encoding
+            try:
+                body = decode_body(body, source_encoding)
+            except (OSError, ValueError, zlib.error):
+                return body, source_encoding
+        target = choose_client_encoding(accepted, header_value(headers, "Content-Type"), len(body))
+        if target is None:
+            return body, None
+        if variants is not None and target in variants:
+            return variants[target], target
+        encoded = encode_body(body, target)
+        if len(encoded) >= len(body):
+            return body, None
+        if variants is not None:
+            variants[target] = encoded
+        return encoded, target
+
+    def send_binary_response(self, status_code, headers, body, variants=None):
+        encode_started = time.monotonic()
+        body, content_encoding = self.negotiate_encoding(headers, body, variants)
+        record_timing("encode", time.monotonic() - encode_started)
+        self.send_response(status_code)
+        for key, value in headers.items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(key, value)
+        if content_encoding:
+            self.send_header("Content-Encoding", content_encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        send_started = time.monotonic()
+        self.wfile.write(body)
+        record_timing("send", time.monotonic() - send_started)
+
+    def send_result(self, result, cache_status, shared=False):
+        headers = dict(result["headers"])
+        headers["X-Cache"] = cache_status
+        if shared:
+            headers["X-Coalesced"] = "1"
+        if cache_status in ("HIT", "STALE"):
+            headers["Age"] = str(max(0, int(time.time() - result["stored_at"])))
+            if result.get("tier"):
+                headers["X-Cache-Tier"] = result["tier"]
+        self.send_binary_response(result["status"], headers, result["body"], result.get("variants"))
+
+    def write_body_chunk(self, data, chunked):
+        if not data:
+            return
+        if chunked:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+
+    def send_stream(self, result, upstream_stream, cache_status):
+        headers = result["headers"]
+        content_type = header_value(headers, "Content-Type")
+        accepted = parse_accept_encoding(self.headers.get("Accept-Encoding"))
+        content_encoding = (header_value(headers, "Content-Encoding") or "identity").strip().lower()
+        length = header_value(headers, "Content-Length")
+        transform = None
+        if content_encoding != "identity" and content_encoding not in accepted:
+            transform = stream_decoder(content_encoding)
+            if transform is not None:
+                content_encoding = "identity"
+        elif content_encoding == "identity" and COMPRESSION_ENABLED and "gzip" in accepted and is_compressible(content_type):
+            if length is None or int(length) >= COMPRESSION_MIN_BYTES:
+                transform = stream_gzip_encoder()
+                content_encoding = "gzip"
+        if transform is not None:
+            length = None
+        chunked = length is None and self.request_version == "HTTP/1.1"
+
+        self.send_response(result["status"])
+        for key, value in headers.items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(key, value)
+        self.send_header("X-Cache", cache_status)
+        if content_encoding != "identity":
+            self.send_header("Content-Encoding", content_encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        if length is not None:
+            self.send_header("Content-Length", length)
+        elif chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            if SERVER_TIMING_ENABLED:
+                self.send_header("Trailer", "Server-Timing")
+        else:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        send_started = time.monotonic()
+        tee = []
+        tee_limit = RESPONSE_CACHE.max_entry_bytes if RESPONSE_CACHE is not None else 0
+        teed = 0
+        try:
+            while True:
+                chunk = upstream_stream.read_chunk()
+                if not chunk:
+                    break
+                if tee is not None:
+                    teed += len(chunk)
+                    if teed > tee_limit:
+                        tee = None
+                    else:
+                        tee.append(chunk)
+                self.write_body_chunk(transform[0](chunk) if transform else chunk, chunked)
+            if transform is not None:
+                self.write_body_chunk(transform[1](), chunked)
+            send_seconds = time.monotonic() - send_started
+            record_timing("send", send_seconds)
+            if chunked and SERVER_TIMING_ENABLED:
+                self.wfile.write(f"0\r\nServer-Timing: send;dur={send_seconds * 1000:.1f}\r\n\r\n".encode("ascii"))
+            elif chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            upstream_stream.close()
+            self.close_connection = True
+            print(f"[stream] aborted {upstream_stream.url}: {e}")
+            return None
+        return b"".join(tee) if tee is not None else None
+
+    def serve_streamed(self, cache_key, ttl, streamer, fetcher, cache_status):
+        streamed_here = []
+
+        def lead():
+            result = streamer()
+            upstream_stream = result.pop("stream", None)
+            if upstream_stream is None:
+                if RESPONSE_CACHE is not None and ttl > 0 and is_cacheable_result(result):
+                    RESPONSE_CACHE.put(cache_key, result, ttl)
+                return result
+            body = self.send_stream(result, upstream_stream, cache_status)
+            streamed_here.append(True)
+            if body is None:
+                return {"ok": False, "streamed": True}
+            result["body"] = body
+            if CONDITIONAL_STORE is not None and result.get("target_url"):
+                CONDITIONAL_STORE.remember(result["target_url"], result["status"], result["headers"], body)
+            if RESPONSE_CACHE is not None and ttl > 0 and is_cacheable_result(result):
+                RESPONSE_CACHE.put(cache_key, result, ttl)
+            return result
+
+        result, shared = self.fetch_coalesced(cache_key, lead)
+        if streamed_here:
+            return
+        if shared and result.get("streamed"):
+            result, shared = fetcher(), False
+        self.send_fetched(cache_key, result, cache_status, shared)
+
+    def fetch_coalesced(self, key, fetcher):
+        if SINGLE_FLIGHT is None:
+            return fetcher(), False
+        return SINGLE_FLIGHT.do(key, fetcher)
+
+    def cache_lookup(self, cache_key, ttl, fetcher):
+        if RESPONSE_CACHE is None or ttl <= 0:
+            return None, "BYPASS"
+        bypass_lookup = "no-cache" in (self.headers.get("Cache-Control") or "").lower()
+        entry, state = (None, None) if bypass_lookup else RESPONSE_CACHE.get(cache_key)
+        if state == "fresh":
+            return entry, "HIT"
+        if state == "stale":
+            if RESPONSE_CACHE.begin_refresh(cache_key):
+                threading.Thread(target=self.refresh_cache_entry, args=(cache_key, ttl, fetcher), daemon=True).start()
+            return entry, "STALE"
+        return None, "MISS"
+
+    def fetch_for_cache(self, cache_key, ttl, fetcher, cache_status):
+        if cache_status == "BYPASS":
+            return self.fetch_coalesced(cache_key, fetcher)
+        return self.fetch_coalesced(cache_key, lambda: self.fetch_and_store(cache_key, ttl, fetcher))
+
+    def cached_result(self, cache_key, ttl, fetcher):
+        entry, cache_status = self.cache_lookup(cache_key, ttl, fetcher)
+        if entry is not None:
+            return entry, cache_status, False
+        result, shared = self.fetch_for_cache(cache_key, ttl, fetcher, cache_status)
+        return result, cache_status, shared
+
+    def serve_with_cache(self, cache_key, ttl, fetcher, streamer=None):
+        if CACHE_WARMER is not None and ttl > 0 and self.command == "GET":
+            CACHE_WARMER.observe(self.path, cache_key, ttl, counted=not self.is_prefetch())
+        entry, cache_status = self.cache_lookup(cache_key, ttl, fetcher)
+        if entry is not None:
+            self.send_result(entry, cache_status)
+            return
+        if STREAMING_ENABLED and streamer is not None:
+            self.serve_streamed(cache_key, ttl if cache_status == "MISS" else 0, streamer, fetcher, cache_status)
+            return
+        result, shared = self.fetch_for_cache(cache_key, ttl, fetcher, cache_status)
+        self.send_fetched(cache_key, result, cache_status, shared)
+
+    def send_fetched(self, cache_key, result, cache_status, shared=False):
+        if result.get("busy") and RESPONSE_CACHE is not None:
+            entry = RESPONSE_CACHE.peek(cache_key)
+            if entry is not None:
+                self.send_result({**entry, "headers": {**entry["headers"], "X-Load-Shed": "1"}}, "STALE")
+                return
+        self.send_result(result, cache_status, shared)
+
+    def fetch_and_store(self, cache_key, ttl, fetcher):
+        result = fetcher()
+        if is_cacheable_result(result):
+            RESPONSE_CACHE.put(cache_key, result, ttl)
+        return result
+
+    def refresh_cache_entry(self, cache_key, ttl, fetcher):
+        try:
+            self.fetch_coalesced(cache_key, lambda: self.fetch_and_store(cache_key, ttl, fetcher))
+        except Exception as e:
+            print(f"[cache] background refresh failed for {cache_key}: {e}")
+        finally:
+            RESPONSE_CACHE.end_refresh(cache_key)
+
+    def upstream_error_result(self, error):
+        if isinstance(error, urllib.error.HTTPError):
+            body = error.read()
+            try:
+                body = decode_body(body, error.headers.get("Content-Encoding"))
+            except (OSError, ValueError, zlib.error):
+                pass
+            return {"ok": False, "status": error.code, "headers": {}, "body": body}
+        if isinstance(error, UpstreamBusy):
+            return {
+                "ok": False,
+                "status": 503,
+                "headers": {"Content-Type": "text/plain; charset=utf-8", "Retry-After": str(error.retry_after)},
+                "body": str(error).encode("utf-8"),
+                "busy": error.retry_after,
+            }
+        return {"ok": False, "status": 500, "headers": {}, "body": str(error).encode("utf-8")}
+
+    def fetch_upstream(self, target_url, accept_header):
+        started = time.monotonic()
+        try:
+            status_code, headers, body = self.request_url(target_url, accept_header, REQUEST_TIMEOUT_SECONDS, decode=False)
+        except Exception as e:
+            result = self.upstream_error_result(e)
+        else:
+            result = {"ok": True, "status": status_code, "headers": headers, "body": body, "source": target_url}
+        record_upstream(source_origin(target_url), upstream_outcome(result), started)
+        return result
+
+    def stream_upstream(self, target_url, accept_header):
+        started = time.monotonic()
+        try:
+            opened = self.open_url(target_url, accept_header, REQUEST_TIMEOUT_SECONDS)
+        except Exception as e:
+            result = self.upstream_error_result(e)
+        else:
+            result = {"ok": True, "source": target_url, "target_url": target_url, **opened}
+        record_upstream(source_origin(target_url), upstream_outcome(result), started)
+        return result
+
+    def source_url(self, base_url, suffix):
+        joined = urljoin(f"{base_url.rstrip('/')}/", suffix.lstrip("/"))
+        return joined
+
+    def resolve_suffix(self, route_path, query, prefix):
+        suffix = route_path[len(prefix):]
+        if not suffix:
+            suffix = "/"
+        if not suffix.startswith("/"):
+            suffix = f"/{suffix}"
+        if query:
+            suffix = f"{suffix}?{query}"
+        return suffix
+
+    def attempt_source(self, network_name, source, suffix, validator, accept_header, timeout_seconds, cancel_token=None, stream_validator=None, quiet=False, deadline=None):
+        target_url = self.source_url(source, suffix)
+        timeouts = SOURCE_HEALTH.timeouts(source, timeout_seconds)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"ok": False, "failure": f"{target_url} -> skipped, deadline exceeded"}
+            timeouts = (min(timeouts[0], remaining), min(timeouts[1], remaining))
+        if not quiet:
+            print(f"[{network_name}] trying {target_url}")
+        SOURCE_HEALTH.begin(source)
+        started = time.monotonic()
+        REQUEST_TIMING.attempt = phases = {}
+        upstream_stream = None
+        try:
+            if stream_validator is not None:
+                opened = self.open_url(target_url, accept_header, timeouts, cancel_token)
+            else:
+                status_code, headers, body = self.request_url(target_url, accept_header, timeouts, cancel_token)
+                opened = {"status": status_code, "headers": headers, "body": body}
+            status_code = opened["status"]
+            content_type = header_value(opened["headers"], "Content-Type") or ""
+            encoding = header_value(opened["headers"], "Content-Encoding")
+            upstream_stream = opened.get("stream")
+            validate_started = time.monotonic()
+            if upstream_stream is not None:
+                prefix = decode_prefix(upstream_stream.peek(VALIDATION_PREFIX_BYTES), encoding, VALIDATION_PREFIX_BYTES)
+                decoded = prefix.decode("utf-8", errors="ignore")
+                valid = status_code == 200 and stream_validator(content_type, decoded)
+                if not valid:
+                    upstream_stream.close()
+            else:
+                decoded = decode_body(opened["body"], encoding).decode("utf-8", errors="ignore")
+                valid = status_code == 200 and validator(content_type, decoded)
+            record_timing("validate", time.monotonic() - validate_started)
+            if valid:
+                SOURCE_HEALTH.record_success(source, time.monotonic() - started)
+                record_upstream(source, "success", started)
+                return {
+                    "ok": True,
+                    **opened,
+                    "source": source,
+                    "target_url": target_url,
+                }
+            kind = "challenge" if has_challenge_markers(decoded, REDLIB_CHALLENGE_MARKERS) else "invalid"
+            SOURCE_HEALTH.record_failure(source, kind, f"invalid payload (status={status_code})")
+            record_upstream(source, "invalid_payload", started)
+            return {"ok": False, "failure": f"{target_url} -> invalid payload (status={status_code})"}
+        except urllib.error.HTTPError as e:
+            SOURCE_HEALTH.record_failure(source, "http", f"HTTP {e.code}")
+            record_upstream(source, "http_error", started)
+            return {"ok": False, "failure": f"{target_url} -> HTTP {e.code}"}
+        except UpstreamCancelled:
+            record_upstream(source, "cancelled", started)
+            return {"ok": False, "failure": f"{target_url} -> cancelled"}
+        except UpstreamBusy as e:
+            record_upstream(source, "shed", started)
+            return {"ok": False, "failure": f"{target_url} -> shed, source busy", "busy": e.retry_after}
+        except Exception as e:
+            if upstream_stream is not None:
+                upstream_stream.close()
+            if is_timeout_error(e):
+                SOURCE_HEALTH.record_timeout(source, timeouts, "connect" not in phases)
+            SOURCE_HEALTH.record_failure(source, "error", str(e))
+            record_upstream(source, "error", started)
+            return {"ok": False, "failure": f"{target_url} -> {e}"}
+        finally:
+            REQUEST_TIMING.attempt = None
+            SOURCE_HEALTH.record_phases(source, phases)
+
+    def fetch_valid_source(self, network_name, sources, suffix, validator, accept_header, timeout_seconds, stream_validator=None, deadline=None):
+        candidates = SOURCE_HEALTH.order(sources)[:max(1, MAX_DIRECT_SOURCE_ATTEMPTS)]
+        if HEDGED_FETCH_ENABLED and HEDGE_MAX_IN_FLIGHT > 1 and len(candidates) > 1:
+            return self.fetch_valid_source_hedged(network_name, candidates, suffix, validator, accept_header, timeout_seconds, stream_validator, deadline)
+        failures = []
+        busy = []
+        for source in candidates:
+            if deadline is not None and deadline <= time.monotonic():
+                failures.append(f"{network_name}: direct attempts stopped, deadline exceeded")
+                break
+            result = self.attempt_source(network_name, source, suffix, validator, accept_header, timeout_seconds, stream_validator=stream_validator, deadline=deadline)
+            if result.get("ok"):
+                return result
+            failures.append(result["failure"])
+            if result.get("busy"):
+                busy.append(result["busy"])
+        return {"ok": False, "failures": failures, "busy": min(busy) if busy else None}
+
+    def fetch_valid_source_hedged(self, network_name, candidates, suffix, validator, accept_header, timeout_seconds, stream_validator=None, deadline=None):
+        results = queue.Queue()
+        cancel_token = CancelToken()
+        hedge_delay = max(0, HEDGE_DELAY_MS) / 1000
+        failures = []
+        busy = []
+        next_index = 0
+        in_flight = 0
+
+        timing = current_timing()
+        publish_lock = threading.Lock()
+        settled = []
+
+        def run_attempt(source):
+            REQUEST_TIMING.current = timing
+            try:
+                result = self.attempt_source(network_name, source, suffix, validator, accept_header, timeout_seconds, cancel_token, stream_validator, deadline=deadline)
+            except Exception as e:
+                result = {"ok": False, "failure": f"{source} -> {e}"}
+            with publish_lock:
+                if not settled:
+                    results.put(result)
+                    return
+            discard_attempt(result)
+
+        def settle():
+            # Attempts that finish after this point discard their own result; the ones
+            # already queued are discarded here, so no losing stream keeps its pooled
+            # connection or upstream limiter slot.
+            with publish_lock:
+                settled.append(True)
+            while True:
+                try:
+                    discard_attempt(results.get_nowait())
+                except queue.Empty:
+                    return
+
+        while True:
+            if next_index < len(candidates) and in_flight < HEDGE_MAX_IN_FLIGHT:
+                threading.Thread(target=run_attempt, args=(candidates[next_index],), daemon=True).start()
+                next_index += 1
+                in_flight += 1
+            if in_flight == 0:
+                break
+            can_hedge = next_index < len(candidates) and in_flight < HEDGE_MAX_IN_FLIGHT
+            wait = hedge_delay if can_hedge else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    cancel_token.cancel()
+                    settle()
+                    failures.append(f"{network_name}: {in_flight} attempt(s) cancelled, deadline exceeded")
+                    break
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                result = results.get(timeout=wait)
+            except queue.Empty:
+                continue
+            in_flight -= 1
+            if result.get("ok"):
+                winner_stream = result.get("stream")
+                if winner_stream is not None:
+                    cancel_token.detach(winner_stream.conn)
+                    winner_stream.cancel_token = None
+                cancel_token.cancel()
+                settle()
+                return result
+            failures.append(result["failure"])
+            if result.get("busy"):
+                busy.append(result["busy"])
+        return {"ok": False, "failures": failures, "busy": min(busy) if busy else None}
+
+    def fetch_safe_proxy_fallback(self, network_name, fallback_sources, suffix, validator, content_type, deadline=None):
+        if not fallback_sources:
+            return {"ok": False, "error": f"{network_name}: no fallback source configured"}
+        errors = []
+        for fallback_source in fallback_sources[:max(1, MAX_PROXY_FALLBACK_ATTEMPTS)]:
+            timeout_seconds = REQUEST_TIMEOUT_SECONDS
+            if deadline is not None:
+                timeout_seconds = min(timeout_seconds, deadline - time.monotonic())
+                if timeout_seconds <= 0:
+                    errors.append(f"{network_name}: fallback stopped, deadline exceeded")
+                    break
+            target_url = self.source_url(fallback_source, suffix)
+            allorigins_url = f"{ALLORIGINS_URL}?url={quote(target_url, safe='')}"
+            print(f"[{network_name}] proxy fallback via {allorigins_url}")
+            started = time.monotonic()
+            try:
+                status_code, _, body = self.request_url(allorigins_url, "application/json, */*", timeout_seconds)
+                if status_code != 200:
+                    record_upstream("allorigins", "http_error", started)
+                    errors.append(f"{target_url} -> fallback status {status_code}")
+                    continue
+                wrapped = json.loads(body.decode("utf-8", errors="ignore"))
+                content = wrapped.get("contents", "")
+                if not validator("text/plain", content):
+                    record_upstream("allorigins", "invalid_payload", started)
+                    errors.append(f"{target_url} -> fallback payload validation failed")
+                    continue
+                record_upstream("allorigins", "fallback", started)
+                return {
+                    "ok": True,
+                    "status": 200,
+                    "headers": {"Content-Type": content_type},
+                    "body": content.encode("utf-8"),
+                    "source": f"allorigins:{fallback_source}",
+                }
+            except UpstreamBusy as e:
+                record_upstream("allorigins", "shed", started)
+                errors.append(f"{target_url} -> fallback shed, allorigins busy")
+                return {"ok": False, "error": "; ".join(errors[:6]), "busy": e.retry_after}
+            except Exception as e:
+                record_upstream("allorigins", "error", started)
+                errors.append(f"{target_url} -> fallback failed ({e})")
+        return {"ok": False, "error": "; ".join(errors[:6])}
+
+    def handle_network_bridge(self, route_path, query, prefix, network_name, enabled, sources, validator, stream_validator, accept_header, fallback_sources, fallback_content_type, feed_json_allowed=False):
         if not enabled:
-            details["ok"] = False
-            details["reason"] = "disabled"
-            return details
+            self.send_error(503, f"{network_name} bridge disabled")
+            return
         if not sources:
-            details["ok"] = False
-            details["reason"] = "no sources configured"
+            self.send_error(503, f"{network_name} bridge has no sources configured")
+            return
+
+        query, projection, key_suffix = self.resolve_projection(prefix, query)
+        query_params = parse_qsl(query, keep_blank_values=True)
+        feed_json = feed_json_allowed and self.wants_feed_json(query_params)
+        if feed_json:
+            query = urlencode([(key, value) for key, value in query_params if key != "format"])
+        suffix = self.resolve_suffix(route_path, query, prefix)
+
+        def fetcher():
+            return self.fetch_bridge(network_name, sources, suffix, validator, accept_header, fallback_sources, fallback_content_type)
+
+        def streamer():
+            return self.fetch_bridge(network_name, sources, suffix, validator, accept_header, fallback_sources, fallback_content_type, stream_validator)
+
+        cache_key = f"{network_name}:{normalize_cache_key(suffix)}"
+        if feed_json:
+            self.serve_with_cache(f"feed-json:{cache_key}", cache_ttl_for(prefix), lambda: self.fetch_feed_json(streamer))
+            return
+        if projection is not None:
+            self.serve_with_cache(cache_key + key_suffix, cache_ttl_for(prefix), projected_fetcher(fetcher, prefix, projection))
+            return
+        self.serve_with_cache(cache_key + key_suffix, cache_ttl_for(prefix), fetcher, streamer)
+
+    def resolve_projection(self, prefix, query):
+        if prefix not in PROJECTION_RULES:
+            return query, None, ""
+        params = parse_qsl(query, keep_blank_values=True)
+        requested = [value for key, value in params if key == "fields"]
+        if not requested:
+            return query, (PROJECTION_RULES[prefix][1] if PROJECTION_ENABLED else None), default_projection_key(prefix)
+        query = urlencode([(key, value) for key, value in params if key != "fields"])
+        paths = sorted({path.strip() for value in requested for path in value.split(",") if path.strip()})
+        if not paths or "all" in paths or "*" in paths:
+            return query, None, "#fields=all" if PROJECTION_ENABLED else ""
+        return query, build_projection(paths), f"#fields={','.join(paths)}"
+
+    def wants_feed_json(self, query_params):
+        return any(key == "format" and value.strip().lower() == "json" for key, value in query_params)
+
+    def fetch_feed_json(self, opener):
+        result = opener()
+        upstream_stream = result.pop("stream", None)
+        if not result.get("ok") or result.get("status") != 200:
+            if upstream_stream is not None:
+                upstream_stream.close()
+            return result
+        try:
+            feed = parse_feed(iter_decoded_chunks(result["headers"], upstream_stream, result.get("body")))
+        except (ElementTree.ParseError, OSError, ValueError, zlib.error) as e:
+            if upstream_stream is not None:
+                upstream_stream.close()
+            error_body = json.dumps({"error": f"feed parse failed: {e}", "source": result.get("source", "")}).encode("utf-8")
+            return {"ok": False, "status": 502, "headers": {"Content-Type": "application/json; charset=utf-8"}, "body": error_body}
+        body = json.dumps(feed, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return {
+            "ok": True,
+            "status": 200,
+            "headers": {"Content-Type": "application/json; charset=utf-8"},
+            "body": body,
+            "source": result.get("source", ""),
+        }
+
+    def fetch_bridge(self, network_name, sources, suffix, validator, accept_header, fallback_sources, fallback_content_type, stream_validator=None):
+        deadline = direct_deadline = None
+        if BRIDGE_DEADLINE_MS > 0:
+            started = time.monotonic()
+            deadline = started + BRIDGE_DEADLINE_MS / 1000
+            direct_deadline = started + BRIDGE_DEADLINE_MS * min(1.0, max(0.0, BRIDGE_DIRECT_SHARE)) / 1000
+        result = self.fetch_valid_source(
+            network_name=network_name,
+            sources=sources,
+            suffix=suffix,
+            validator=validator,
+            accept_header=accept_header,
+            timeout_seconds=REQUEST_TIMEOUT_SECONDS,
+            stream_validator=stream_validator,
+            deadline=direct_deadline,
+        )
+        if result.get("ok"):
+            print(f"[{network_name}] success via {result['source']}")
+            return result
+
+        fallback = self.fetch_safe_proxy_fallback(network_name, fallback_sources, suffix, validator, fallback_content_type, deadline)
+        if fallback.get("ok"):
+            print(f"[{network_name}] success via fallback {fallback['source']}")
+            timing = current_timing()
+            if timing is not None:
+                timing.outcome = "fallback"
+            return fallback
+
+        failure_parts = result.get("failures", []) + [fallback.get("error", "unknown fallback failure")]
+        busy = [value for value in (result.get("busy"), fallback.get("busy")) if value]
+        error_body = json.dumps(
+            {
+                "error": f"{network_name} bridge {'busy' if busy else 'failed'}",
+                "details": failure_parts[:8],
+            },
+            indent=2,
+        ).encode("utf-8")
+        if busy:
+            return {
+                "ok": False,
+                "status": 503,
+                "headers": {"Content-Type": "application/json; charset=utf-8", "Retry-After": str(min(busy))},
+                "body": error_body,
+                "busy": min(busy),
+            }
+        return {
+            "ok": False,
+            "status": 502,
+            "headers": {"Content-Type": "application/json; charset=utf-8"},
+            "body": error_body,
+        }
+
+    def handle_proxy_direct(self, target_url, feed_json=False):
+        print(f"Direct Proxying -> {target_url}")
+        fetcher = lambda: self.fetch_proxy_direct(target_url)
+        streamer = None
+        if not is_jina_url(target_url):
+            streamer = lambda: self.stream_upstream(target_url, "application/rss+xml, application/xml, text/xml, application/json, */*")
+        cache_key = normalize_cache_key(target_url)
+        if feed_json:
+            self.serve_with_cache(f"feed-json:{cache_key}", direct_proxy_ttl(target_url), lambda: self.fetch_feed_json(streamer or fetcher))
+            return
+        self.serve_with_cache(cache_key, direct_proxy_ttl(target_url), fetcher, streamer)
+
+    def fetch_proxy_direct(self, target_url):
+        if not is_jina_url(target_url):
+            return self.fetch_upstream(target_url, "application/rss+xml, application/xml, text/xml, application/json, */*")
+        started = time.monotonic()
+        result = self.fetch_jina(target_url)
+        record_upstream(source_origin(target_url), upstream_outcome(result), started)
+        return result
+
+    def fetch_jina(self, target_url):
+        # r.jina.ai rejects Python's default user agent/TLS handshake; use a curl-like header and TLS profile
+        # on its own pooled connections.
+        headers = {"User-Agent": JINA_USER_AGENT, "Accept": "text/plain"}
+        try:
+            if JINA_POOL is not None:
+                status_code, response_headers, body = JINA_POOL.request(target_url, headers, JINA_TIMEOUT_SECONDS)
+            else:
+                req = urllib.request.Request(target_url, headers=headers)
+                with upstream_slot(target_url, JINA_TIMEOUT_SECONDS), urllib.request.urlopen(req, timeout=JINA_TIMEOUT_SECONDS, context=JINA_SSL_CONTEXT) as response:
+                    status_code, response_headers, body = response.status, dict(response.headers.items()), response.read()
+            body = decode_body(body, header_value(response_headers, "Content-Encoding"))
+        except (socket.timeout, TimeoutError) as e:
+            return {"ok": False, "status": 504, "headers": {}, "body": str(e).encode("utf-8")}
+        except Exception as e:
+            return self.upstream_error_result(e)
+        content_type = header_value(response_headers, "Content-Type") or "text/plain; charset=utf-8"
+        if is_html_like(content_type, body[:600].decode("utf-8", errors="ignore")):
+            print("[jina] got a challenge page instead of reader text")
+            return {"ok": False, "status": 502, "headers": {}, "body": b"r.jina.ai returned a challenge page"}
+        return {
+            "ok": True,
+            "status": status_code,
+            "headers": {"Content-Type": content_type, "X-Proxy-Source": "in-process"},
+            "body": body,
+            "source": "jina",
+        }
+
+    def batch_item(self, target_url):
+        parsed = urlparse(target_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return {"ok": False, "status": 400, "error": "unsupported url"}
+        result, cache_status, _ = self.cached_result(normalize_cache_key(target_url), direct_proxy_ttl(target_url), lambda: self.fetch_proxy_direct(target_url))
+        headers = result.get("headers") or {}
+        body = result.get("body") or b""
+        try:
+            body = decode_body(body, header_value(headers, "Content-Encoding"))
+        except (OSError, ValueError, zlib.error):
+            pass
+        item = {
+            "ok": result.get("ok", True) and 200 <= result["status"] < 300,
+            "status": result["status"],
+            "cache": cache_status,
+            "contentType": header_value(headers, "Content-Type") or "",
+        }
+        try:
+            item["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            item["body"] = base64.b64encode(body).decode("ascii")
+            item["bodyEncoding"] = "base64"
+        return item
+
+    def handle_proxy_batch(self, urls):
+        if not urls:
+            self.send_error(400, "No urls given")
+            return
+        if len(urls) > BATCH_MAX_URLS:
+            self.send_error(400, f"At most {BATCH_MAX_URLS} urls per batch")
+            return
+        print(f"Batch Proxying {len(urls)} urls")
+        encoder = None
+        if COMPRESSION_ENABLED and "gzip" in parse_accept_encoding(self.headers.get("Accept-Encoding")):
+            encoder = stream_gzip_encoder()
+        chunked = self.request_version == "HTTP/1.1"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoder is not None:
+            self.send_header("Content-Encoding", "gzip")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        results = queue.Queue()
+        item_timeout = max(0, BATCH_ITEM_TIMEOUT_MS) / 1000
+        deadlines = {}
+        running = set()
+        next_index = 0
+
+        def run_item(index, target_url):
+            try:
+                item = self.batch_item(target_url)
+            except Exception as e:
+                item = {"ok": False, "status": 500, "error": str(e)}
+            results.put((index, item))
+
+        def emit(index, item):
+            line = json.dumps({"index": index, "url": urls[index], **item}, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            self.write_body_chunk(encoder[0](line) if encoder is not None else line, chunked)
+
+        try:
+            while next_index < len(urls) or deadlines:
+                while next_index < len(urls) and len(running) < max(1, BATCH_MAX_CONCURRENCY):
+                    threading.Thread(target=run_item, args=(next_index, urls[next_index]), daemon=True).start()
+                    running.add(next_index)
+                    deadlines[next_index] = time.monotonic() + item_timeout
+                    next_index += 1
+                timeout = max(0, min(deadlines.values()) - time.monotonic()) if deadlines else None
+                try:
+                    index, item = results.get(timeout=timeout)
+                except queue.Empty:
+                    now = time.monotonic()
+                    for index, deadline in list(deadlines.items()):
+                        if deadline <= now:
+                            del deadlines[index]
+                            emit(index, {"ok": False, "status": 504, "error": "timeout"})
+                    continue
+                running.discard(index)
+                if deadlines.pop(index, None) is not None:
+                    emit(index, item)
+            if encoder is not None:
+                self.write_body_chunk(encoder[1](), chunked)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except OSError as e:
+            self.close_connection = True
+            print(f"[batch] client went away: {e}")
+        while running:
+            index, _ = results.get()
+            running.discard(index)
+
+    def handle_proxy(self, target_base, prefix):
+        path_suffix = self.path[len(prefix):]
+        parsed = urlparse(path_suffix)
+        query, projection, key_suffix = self.resolve_projection(prefix, parsed.query)
+        if query != parsed.query:
+            path_suffix = parsed.path + (f"?{query}" if query else "")
+        target_url = target_base + path_suffix
+        print(f"Proxying {self.path} -> {target_url}")
+        accept_header = "application/rss+xml, application/xml, text/xml, application/json, */*"
+        fetcher = lambda: self.fetch_upstream(target_url, accept_header)
+        if projection is not None:
+            self.serve_with_cache(normalize_cache_key(target_url) + key_suffix, cache_ttl_for(prefix), projected_fetcher(fetcher, prefix, projection))
+            return
+        self.serve_with_cache(
+            normalize_cache_key(target_url) + key_suffix,
+            cache_ttl_for(prefix),
+            fetcher,
+            lambda: self.stream_upstream(target_url, accept_header),
+        )
+
+    def fetch_upstream_post(self, target_url, payload, accept_header):
+        headers = {
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": accept_header,
+            "Accept-Encoding": UPSTREAM_ACCEPT_ENCODING,
+            "Content-Type": "application/json",
+        }
+        started = time.monotonic()
+        try:
+            status_code, response_headers, body = self.request_upstream(target_url, headers, REQUEST_TIMEOUT_SECONDS, method="POST", data=payload)
+        except Exception as e:
+            result = self.upstream_error_result(e)
+        else:
+            result = {"ok": True, "status": status_code, "headers": response_headers, "body": body, "source": target_url}
+        record_upstream(source_origin(target_url), upstream_outcome(result), started)
+        return result
+
+    def feed_target_fetch(self, network, target):
+        kind = FEED_NETWORKS[network][0]
+        if kind == "redlib" and not target.startswith(("http://", "https://")):
+            if REDLIB_ENABLED and REDLIB_SOURCES:
+                return (
+                    f"redlib:{normalize_cache_key(target)}{default_projection_key('/api/redlib')}",
+                    cache_ttl_for("/api/redlib"),
+                    projected_fetcher(
+                        lambda: self.fetch_bridge("redlib", REDLIB_SOURCES, target, validate_redlib_payload, "application/json, text/plain, */*", REDLIB_PUBLIC, "application/json; charset=utf-8"),
+                        "/api/redlib",
+                    ),
+                )
+            target = PROXIES["/api/reddit"] + target
+        if kind == "nitter":
+            if not NITTER_ENABLED or not NITTER_SOURCES:
+                raise ValueError("nitter bridge disabled")
+            return (
+                f"nitter:{normalize_cache_key(target)}",
+                cache_ttl_for("/api/nitter"),
+                lambda: self.fetch_bridge("nitter", NITTER_SOURCES, target, validate_nitter_payload, "application/rss+xml, application/xml, text/xml, */*", NITTER_PUBLIC, "application/rss+xml; charset=utf-8"),
+            )
+        if kind == "post":
+            payload = json.dumps({"limit": FEED_ITEMS_PER_TARGET}).encode("utf-8")
+            return (
+                f"POST {normalize_cache_key(target)} {payload.decode('utf-8')}",
+                feed_target_ttl(target),
+                lambda: self.fetch_upstream_post(target, payload, "application/json, */*"),
+            )
+        return (
+            normalize_cache_key(target) + default_projection_key(proxy_prefix_for(target)),
+            feed_target_ttl(target),
+            projected_fetcher(lambda: self.fetch_upstream(target, "application/rss+xml, application/xml, text/xml, application/json, */*"), proxy_prefix_for(target)),
+        )
+
+    def fetch_feed_target(self, network, target):
+        cache_key, ttl, fetcher = self.feed_target_fetch(network, target)
+        result, cache_status, _ = self.cached_result(cache_key, ttl, fetcher)
+        if result.get("ok") is False or result.get("status") != 200:
+            error = result.get("error") or "; ".join(result.get("failures") or []) or f"HTTP {result.get('status')}"
+            return {"ok": False, "error": error, "cache": cache_status}
+        body = decode_body(result["body"], header_value(result["headers"], "Content-Encoding"))
+        posts = FEED_NETWORKS[network][1](body, target)
+        return {"ok": True, "posts": posts, "cache": cache_status}
+
+    def handle_feed(self, query):
+        if not FEED_ENABLED:
+            self.send_error(503, "feed endpoint disabled")
+            return
+        params = parse_qs(query)
+        networks = []
+        for raw in params.get("networks") or [",".join(FEED_DEFAULT_NETWORKS)]:
+            for name in raw.split(","):
+                name = name.strip().lower()
+                if name and name not in networks:
+                    networks.append(name)
+        unknown = [name for name in networks if name not in FEED_NETWORKS]
+        if unknown:
+            self.send_error(400, f"Unknown feed network: {', '.join(unknown)}")
+            return
+        try:
+            limit = min(max(1, int(params.get("limit", [FEED_PAGE_SIZE])[0])), FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            self.send_error(400, "Invalid limit")
+            return
+        cursor = None
+        if params.get("cursor"):
+            cursor = parse_feed_cursor(params["cursor"][0])
+            if cursor is None:
+                self.send_error(400, "Invalid cursor")
+                return
+
+        started = time.monotonic()
+        results = queue.Queue()
+        report = {name: {"status": "ok", "items": 0, "targets": len(FEED_TARGETS.get(name) or []), "failed": 0, "pending": 0, "cache": []} for name in networks}
+        deadlines = {}
+
+        for name in networks:
+            budget = max(0, FEED_NETWORK_DEADLINES_MS.get(name, FEED_NETWORK_DEADLINE_MS)) / 1000
+            for target in FEED_TARGETS.get(name) or []:
+                fetch = lambda name=name, target=target: self.fetch_feed_target(name, target)
+                if FEED_FETCHES.submit(f"{name} {target}", fetch, results, (name, target)):
+                    report[name]["pending"] += 1
+                    deadlines[(name, target)] = time.monotonic() + budget
+                else:
+                    report[name]["failed"] += 1
+                    report[name]["error"] = "too many feed fetches outstanding"
+
+        posts = {}
+        # Each target has its own network's budget; a target past it stays "pending" in the
+        # report and the response carries whatever the other targets returned in time.
+        while deadlines:
+            try:
+                (network, target), outcome = results.get(timeout=max(0, min(deadlines.values()) - time.monotonic()))
+            except queue.Empty:
+                now = time.monotonic()
+                for key, deadline in list(deadlines.items()):
+                    if deadline <= now:
+                        del deadlines[key]
+                continue
+            if deadlines.pop((network, target), None) is None:
+                continue
+            details = report[network]
+            details["pending"] -= 1
+            details["elapsedMs"] = max(details.get("elapsedMs", 0), round((time.monotonic() - started) * 1000))
+            if outcome.get("cache"):
+                details["cache"].append(outcome["cache"])
+            if not outcome["ok"]:
+                details["failed"] += 1
+                details["error"] = outcome["error"]
+                print(f"[feed] {network} {target} failed: {outcome['error']}")
+                continue
+            now_ms = int(time.time() * 1000)
+            for post in outcome["posts"]:
+                if post.get("id") is None:
+                    continue
+                post = {**post, "timestamp": post["timestamp"] or now_ms}
+                posts[(post["source"], str(post["id"]))] = post
+                details["items"] += 1
+
+        partial = False
+        for details in report.values():
+            if details["targets"] == 0:
+                details["status"] = "unconfigured"
+            elif details["pending"] and details["pending"] == details["targets"]:
+                details["status"] = "timeout"
+            elif details["failed"] == details["targets"]:
+                details["status"] = "error"
+            elif details["pending"] or details["failed"]:
+                details["status"] = "partial"
+            partial = partial or details["status"] != "ok"
+
+        merged = sorted(posts.values(), key=feed_sort_key, reverse=True)
+        if cursor is not None:
+            merged = [post for post in merged if feed_sort_key(post) < cursor]
+        page = merged[:limit]
+        next_cursor = f"{page[-1]['timestamp']}:{page[-1]['id']}" if len(merged) > limit else None
+        succeeded = any(details["status"] in ("ok", "partial") for details in report.values())
+        payload = {
+            "items": page,
+            "nextCursor": next_cursor,
+            "partial": partial,
+            "networks": report,
+            "elapsedMs": round((time.monotonic() - started) * 1000),
+        }
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.send_binary_response(
+            200 if succeeded or not networks else 502,
+            {"Content-Type": "application/json; charset=utf-8", "Cache-Control": "no-store"},
+            body,
+        )
+
+    @classmethod
+    def detached(cls):
+        handler = cls.__new__(cls)
+        handler.requests_handled = 0
+        handler.headers = http.client.HTTPMessage()
+        handler.close_connection = True
+        handler.timing = None
+        return handler
+
+    def probe_all_sources(self, network_name, enabled, sources, path, validator, accept_header):
+        details = network_details(network_name, enabled, sources)
+        if "reason" in details:
+            return details
+        started = time.monotonic()
+        candidates = SOURCE_HEALTH.probe_candidates(sources)
+        slots = threading.BoundedSemaphore(max(1, HEALTH_PROBE_CONCURRENCY))
+        healthy = []
+        errors = []
+
+        def probe(source):
+            with slots:
+                try:
+                    result = self.attempt_source(network_name, source, path, validator, accept_header, HEALTH_PROBE_TIMEOUT_SECONDS, quiet=True)
+                except Exception as e:
+                    result = {"ok": False, "failure": f"{source} -> {e}"}
+            if not result.get("busy"):
+                SOURCE_HEALTH.record_probe(source, bool(result.get("ok")))
+            if result.get("ok"):
+                healthy.append(source)
+            else:
+                errors.append(result["failure"])
+
+        threads = [threading.Thread(target=probe, args=(source,), daemon=True) for source in candidates]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        details["ok"] = bool(healthy)
+        details["probed"] = len(candidates)
+        details["healthy"] = len(healthy)
+        details["skippedOpen"] = len(sources) - len(candidates)
+        details["probeMs"] = round((time.monotonic() - started) * 1000)
+        if healthy:
+            details["source"] = SOURCE_HEALTH.order(healthy)[0]
+        if errors:
+            details["errors"] = errors[:3]
+        return details
+
+    def probe_network(self, network_name, enabled, sources, path, validator, accept_header):
+        details = network_details(network_name, enabled, sources)
+        if "reason" in details:
             return details
         probe = self.fetch_valid_source(
             network_name=network_name,
-            sources=sources[:3],
+            sources=SOURCE_HEALTH.order(sources)[:3],
             suffix=path,
             validator=validator,
             accept_header=accept_header,
@@ -461,30 +3927,45 @@ class SPAHandler(http.server.SimpleHTTPRequestHandler):
             details["source"] = probe["source"]
         else:
             details["errors"] = probe.get("failures", [])[:3]
+        details["sourceHealth"] = SOURCE_HEALTH.snapshot(sources)
         return details
 
     def handle_healthz(self):
-        payload = {
-            "status": "ok",
-            "nitter": self.probe_network(
-                network_name="nitter",
-                enabled=NITTER_ENABLED,
-                sources=NITTER_SOURCES,
-                path="/search/rss?q=privacy",
-                validator=validate_nitter_payload,
-                accept_header="application/rss+xml, application/xml, text/xml, */*",
-            ),
-            "redlib": self.probe_network(
-                network_name="redlib",
-                enabled=REDLIB_ENABLED,
-                sources=REDLIB_SOURCES,
-                path="/r/popular.json?limit=1&raw_json=1",
-                validator=validate_redlib_payload,
-                accept_header="application/json, text/plain, */*",
-            ),
-        }
-        if (payload["nitter"].get("enabled") and not payload["nitter"].get("ok")) or (
-            payload["redlib"].get("enabled") and not payload["redlib"].get("ok")
+        payload = {"status": "ok"}
+        if WORKER_INDEX is not None:
+            payload["process"] = {"worker": WORKER_INDEX, "pid": os.getpid(), "processes": SERVER_PROCESSES, "reusePort": REUSE_PORT_ENABLED}
+        if HEALTH_MONITOR is not None:
+            results, payload["monitor"] = HEALTH_MONITOR.snapshot()
+            for network_name, enabled, sources, _, _, _ in HEALTH_PROBES:
+                payload[network_name] = results.get(network_name) or network_details(network_name, enabled, sources)
+                if "ok" not in payload[network_name]:
+                    payload[network_name]["ok"] = None
+                    payload[network_name]["reason"] = "first probe pending"
+                payload[network_name]["sourceHealth"] = SOURCE_HEALTH.snapshot(sources)
+        else:
+            for network_name, enabled, sources, path, validator, accept_header in HEALTH_PROBES:
+                payload[network_name] = self.probe_network(network_name, enabled, sources, path, validator, accept_header)
+        if UPSTREAM_POOL is not None:
+            payload["upstreamPool"] = UPSTREAM_POOL.snapshot()
+        if JINA_POOL is not None:
+            payload["jinaPool"] = JINA_POOL.snapshot()
+        if UPSTREAM_LIMITER is not None:
+            payload["upstreamLimits"] = UPSTREAM_LIMITER.snapshot()
+        if CACHE_WARMER is not None:
+            payload["prefetch"] = CACHE_WARMER.snapshot()
+        if RESPONSE_CACHE is not None:
+            payload["cache"] = RESPONSE_CACHE.snapshot()
+        if SINGLE_FLIGHT is not None:
+            payload["singleFlight"] = SINGLE_FLIGHT.snapshot()
+        if SHARED_STATE is not None:
+            payload["sharedState"] = SHARED_STATE.snapshot()
+        if FEED_ENABLED:
+            payload["feedFetches"] = FEED_FETCHES.snapshot()
+        if CONDITIONAL_STORE is not None:
+            payload["conditional"] = CONDITIONAL_STORE.snapshot()
+        payload["projection"] = PROJECTION_STATS.snapshot()
+        if (payload["nitter"].get("enabled") and payload["nitter"].get("ok") is False) or (
+            payload["redlib"].get("enabled") and payload["redlib"].get("ok") is False
         ):
             payload["status"] = "degraded"
         body = json.dumps(payload, indent=2).encode("utf-8")
@@ -494,6 +3975,563 @@ class SPAHandler(http.server.SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def handle_metrics(self):
+        if METRICS is None:
+            self.send_error(503, "metrics disabled")
+            return
+        gauges = {}
+        for component, snapshot_source in (("cache", RESPONSE_CACHE), ("upstream_pool", UPSTREAM_POOL), ("jina_pool", JINA_POOL)):
+            if snapshot_source is None:
+                continue
+            for key, value in snapshot_source.snapshot().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"{component}_{metric_name(key)}"] = value
+        projection = PROJECTION_STATS.snapshot()
+        gauges.update({f"projection_{metric_name(key)}": value for key, value in projection.items() if isinstance(value, (int, float))})
+        body = METRICS.render(gauges)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def client_idle_for(last_client, now):
+    idle = now - last_client
+    if SHARED_STATE is not None:
+        last_activity = SHARED_STATE.last_activity()
+        if last_activity is not None:
+            idle = min(idle, time.time() - last_activity)
+    return idle
+
+
+class HealthMonitor:
+    def __init__(self, interval_seconds, jitter, idle_seconds):
+        self.interval_seconds = max(5, interval_seconds)
+        self.jitter = max(0.0, min(0.9, jitter))
+        self.idle_seconds = max(self.interval_seconds, idle_seconds)
+        self.lock = threading.Lock()
+        self.results = {}
+        self.rounds = 0
+        self.skipped_idle = 0
+        self.last_client = time.monotonic()
+        self.last_round = None
+        self.last_round_ms = None
+        self.running = False
+        self.stop_event = threading.Event()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, name="health-monitor", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def touch(self):
+        self.last_client = time.monotonic()
+        if SHARED_STATE is not None:
+            SHARED_STATE.touch()
+
+    def probe_round(self, handler):
+        started = time.monotonic()
+        results = {}
+        for network_name, enabled, sources, path, validator, accept_header in HEALTH_PROBES:
+            try:
+                results[network_name] = handler.probe_all_sources(network_name, enabled, sources, path, validator, accept_header)
+            except Exception as e:
+                results[network_name] = {**network_details(network_name, enabled, sources), "ok": False, "reason": str(e)}
+        elapsed_ms = round((time.monotonic() - started) * 1000)
+        with self.lock:
+            self.results = results
+            self.rounds += 1
+            self.last_round = time.time()
+            self.last_round_ms = elapsed_ms
+        if SHARED_STATE is not None:
+            SHARED_STATE.publish_round(results, self.snapshot()[1])
+        summary = ", ".join(
+            f"{name} {details.get('healthy', 0)}/{details.get('probed', 0)} healthy"
+            for name, details in results.items()
+            if "probed" in details
+        )
+        if summary:
+            print(f"[health] probe round: {summary} ({elapsed_ms} ms)")
+
+    def run(self):
+        handler = SPAHandler.detached()
+        while not self.stop_event.is_set():
+            # Without client traffic nobody reads the results, so leave third-party hosts alone.
+            if client_idle_for(self.last_client, time.monotonic()) > self.idle_seconds:
+                with self.lock:
+                    self.skipped_idle += 1
+            else:
+                self.probe_round(handler)
+            self.stop_event.wait(self.interval_seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def snapshot(self):
+        if not self.running and SHARED_STATE is not None:
+            results, meta = SHARED_STATE.load_round()
+            if meta.get("lastRound"):
+                meta["lastRoundAgeSeconds"] = round(time.time() - meta["lastRound"], 1)
+            return results, meta
+        with self.lock:
+            results = {name: dict(details) for name, details in self.results.items()}
+            meta = {
+                "rounds": self.rounds,
+                "skippedIdle": self.skipped_idle,
+                "intervalSeconds": self.interval_seconds,
+                "lastRoundAgeSeconds": round(time.time() - self.last_round, 1) if self.last_round else None,
+                "lastRound": self.last_round,
+                "lastRoundMs": self.last_round_ms,
+            }
+        return results, meta
+
+
+HEALTH_MONITOR = HealthMonitor(HEALTH_INTERVAL_SECONDS, HEALTH_INTERVAL_JITTER, HEALTH_IDLE_SECONDS) if HEALTH_MONITOR_ENABLED else None
+
+
+class CacheWarmer:
+    def __init__(self, paths, interval_seconds, idle_seconds, top_keys, min_hits):
+        self.interval_seconds = max(1, interval_seconds)
+        self.idle_seconds = max(self.interval_seconds, idle_seconds)
+        self.top_keys = max(0, top_keys)
+        self.min_hits = max(1, min_hits)
+        self.lock = threading.Lock()
+        self.tracked = {path: {"cache_key": None, "ttl": 0, "score": 0.0, "seen": 0.0, "warmed": 0.0, "configured": True} for path in paths}
+        self.last_client = 0.0
+        self.shared_hits = {}
+        self.shared_flushed = 0.0
+        self.stats = {"rounds": 0, "warmed": 0, "failed": 0, "shed": 0, "skippedIdle": 0}
+        self.stop_event = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name="cache-warmer", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def touch(self):
+        self.last_client = time.monotonic()
+        if SHARED_STATE is not None:
+            SHARED_STATE.touch()
+
+    def idle_for(self, now):
+        return client_idle_for(self.last_client, now)
+
+    def observe(self, path, cache_key, ttl, counted=True):
+        if counted and SHARED_STATE is not None:
+            self.queue_shared_hit(path, cache_key, ttl)
+            return
+        self.record(path, cache_key, ttl, 1 if counted else 0, time.monotonic())
+
+    def queue_shared_hit(self, path, cache_key, ttl):
+        # In multi-process mode every worker logs its hits to the shared store and the
+        # worker running the warmer drains them, so popularity reflects all traffic.
+        now = time.monotonic()
+        with self.lock:
+            _, _, hits = self.shared_hits.get(path, (None, 0, 0))
+            self.shared_hits[path] = (cache_key, ttl, hits + 1)
+            if now - self.shared_flushed < SHARED_SYNC_SECONDS:
+                return
+            batch = self.shared_hits
+            self.shared_hits = {}
+            self.shared_flushed = now
+        SHARED_STATE.record_route_hits(batch)
+
+    def pull_shared_hits(self):
+        if SHARED_STATE is None:
+            return
+        now = time.monotonic()
+        for path, cache_key, ttl, hits in SHARED_STATE.drain_route_hits():
+            self.record(path, cache_key, ttl, hits, now)
+
+    def record(self, path, cache_key, ttl, hits, now):
+        with self.lock:
+            item = self.tracked.get(path)
+            if item is None:
+                if not hits:
+                    return
+                if len(self.tracked) >= PREFETCH_MAX_TRACKED:
+                    self.evict_locked(now)
+                item = self.tracked[path] = {"cache_key": None, "ttl": 0, "score": 0.0, "seen": now, "warmed": 0.0, "configured": False}
+            item["cache_key"] = cache_key
+            item["ttl"] = ttl
+            if hits:
+                item["score"] = self.decayed(item, now) + hits
+                item["seen"] = now
+
+    def decayed(self, item, now):
+        return item["score"] * 0.5 ** ((now - item["seen"]) / PREFETCH_HALF_LIFE_SECONDS)
+
+    def evict_locked(self, now):
+        learned = [path for path, item in self.tracked.items() if not item["configured"]]
+        if learned:
+            del self.tracked[min(learned, key=lambda path: self.decayed(self.tracked[path], now))]
+
+    def due_paths(self, now):
+        wall_now = time.time()
+        with self.lock:
+            hot = sorted(
+                (path for path, item in self.tracked.items() if not item["configured"] and self.decayed(item, now) >= self.min_hits),
+                key=lambda path: -self.decayed(self.tracked[path], now),
+            )[:self.top_keys]
+            candidates = [path for path, item in self.tracked.items() if item["configured"]] + hot
+            due = []
+            for path in candidates:
+                item = self.tracked[path]
+                expires_at = RESPONSE_CACHE.expires_at(item["cache_key"]) if item["cache_key"] else None
+                if expires_at is None:
+                    if now - item["warmed"] >= max(60, item["ttl"]):
+                        due.append(path)
+                    continue
+                lead = max(self.interval_seconds * 1.5, item["ttl"] * random.uniform(0.1, 0.25))
+                if expires_at - wall_now <= lead:
+                    due.append(path)
+            return due
+
+    def warm(self, path):
+        conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=max(REQUEST_TIMEOUT_SECONDS, BRIDGE_DEADLINE_MS / 1000) + 5)
+        try:
+            conn.request("GET", path, headers={PREFETCH_HEADER: "1", "Cache-Control": "no-cache", "Accept-Encoding": "identity"})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def run_round(self):
+        self.pull_shared_hits()
+        now = time.monotonic()
+        if self.idle_for(now) > self.idle_seconds:
+            self.stats["skippedIdle"] += 1
+            return
+        self.stats["rounds"] += 1
+        for path in self.due_paths(now)[:PREFETCH_MAX_PER_ROUND]:
+            if self.stop_event.is_set():
+                return
+            with self.lock:
+                self.tracked[path]["warmed"] = time.monotonic()
+            try:
+                status = self.warm(path)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"[prefetch] {path} failed: {e}")
+                continue
+            if status == 503:
+                self.stats["shed"] += 1
+                print(f"[prefetch] {path} shed by upstream limits, pausing until next round")
+                return
+            self.stats["warmed" if status < 400 else "failed"] += 1
+            self.stop_event.wait(random.uniform(0.2, 1.0))
+
+    def run(self):
+        while not self.stop_event.wait(self.interval_seconds * random.uniform(0.8, 1.2)):
+            try:
+                self.run_round()
+            except Exception as e:
+                print(f"[prefetch] round failed: {e}")
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            hot = sorted(((path, self.decayed(item, now)) for path, item in self.tracked.items()), key=lambda pair: -pair[1])
+            return {
+                **self.stats,
+                "tracked": len(self.tracked),
+                "configured": len([item for item in self.tracked.values() if item["configured"]]),
+                "idleSeconds": round(now - self.last_client, 1) if self.last_client else None,
+                "hot": [{"path": path, "score": round(score, 1)} for path, score in hot[:self.top_keys]],
+            }
+
+
+CACHE_WARMER = (
+    CacheWarmer(PREFETCH_PATHS, PREFETCH_INTERVAL_SECONDS, PREFETCH_IDLE_SECONDS, PREFETCH_TOP_KEYS, PREFETCH_MIN_HITS)
+    if PREFETCH_ENABLED and RESPONSE_CACHE is not None
+    else None
+)
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    # Accepted sockets wait in a bounded queue for a fixed set of workers; when the
+    # queue is full the client gets an immediate 503 instead of stalling.
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers, queue_size, bind_and_activate=True):
+        self.request_queue_size = max(5, queue_size)
+        self.pending = queue.Queue(maxsize=max(1, queue_size))
+        self.workers = []
+        super().__init__(server_address, handler_class, bind_and_activate)
+        for index in range(max(1, workers)):
+            worker = threading.Thread(target=self.worker_loop, name=f"portal-worker-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            self.reject_request(request)
+
+    def reject_request(self, request):
+        body = b"Server busy, retry shortly"
+        head = (
+            "HTTP/1.0 503 Service Unavailable\r\n"
+            "Retry-After: 1\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        try:
+            request.settimeout(1)
+            request.sendall(head + body)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def worker_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        deadline = time.monotonic() + max(0, SHUTDOWN_GRACE_SECONDS)
+        for _ in self.workers:
+            try:
+                self.pending.put(None, timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for worker in self.workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+
+
+class DrainingThreadingHTTPServer(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = False
+    block_on_close = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handler_lock = threading.Lock()
+        self.handler_threads = set()
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self.process_request_thread, args=(request, client_address), daemon=self.daemon_threads)
+        with self.handler_lock:
+            self.handler_threads.add(thread)
+        thread.start()
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self.handler_lock:
+                self.handler_threads.discard(threading.current_thread())
+
+    def server_close(self):
+        super().server_close()
+        deadline = time.monotonic() + max(0, SHUTDOWN_GRACE_SECONDS)
+        with self.handler_lock:
+            threads = list(self.handler_threads)
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+
+class SingleHTTPServer(http.server.HTTPServer):
+    allow_reuse_address = True
+    supports_keep_alive = False
+
+
+def build_server(mode, address, listen_socket=None):
+    bind = listen_socket is None
+    if mode == "pool":
+        httpd = PooledHTTPServer(address, SPAHandler, SERVER_WORKERS, SERVER_ACCEPT_QUEUE, bind)
+    elif mode == "thread":
+        httpd = DrainingThreadingHTTPServer(address, SPAHandler, bind)
+    elif mode == "single":
+        httpd = SingleHTTPServer(address, SPAHandler, bind)
+    else:
+        raise ValueError(f"Unknown SOCIAL_PORTAL_SERVER_MODE: {mode} (expected pool, thread or single)")
+    if listen_socket is not None:
+        httpd.socket.close()
+        httpd.socket = listen_socket
+        httpd.server_address = listen_socket.getsockname()
+        httpd.server_name, httpd.server_port = address[0], httpd.server_address[1]
+    return httpd
+
+
+def open_listen_socket(address, reuse_port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        sock.listen(max(5, SERVER_ACCEPT_QUEUE))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def serve(address, listen_socket=None, background=True):
+    with build_server(SERVER_MODE, address, listen_socket) as httpd:
+        install_shutdown_signal(httpd)
+        if HEALTH_MONITOR is not None and background:
+            HEALTH_MONITOR.start()
+        if CACHE_WARMER is not None and background:
+            CACHE_WARMER.start()
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down.")
+    if HEALTH_MONITOR is not None:
+        HEALTH_MONITOR.stop()
+    if CACHE_WARMER is not None:
+        CACHE_WARMER.stop()
+
+
+def run_worker(index, address, listen_socket):
+    global WORKER_INDEX
+    WORKER_INDEX = index
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if RESPONSE_CACHE is not None and RESPONSE_CACHE.disk is not None:
+        RESPONSE_CACHE.disk.reopen()
+    SOURCE_HEALTH.shared = SHARED_STATE
+    if UPSTREAM_LIMITER is not None:
+        UPSTREAM_LIMITER.share(SERVER_PROCESSES)
+    if listen_socket is None:
+        listen_socket = open_listen_socket(address, True)
+    print(f"[worker {index}] pid {os.getpid()} serving")
+    serve(address, listen_socket, background=index == 0)
+
+
+class WorkerSupervisor:
+    # Pre-forks SOCIAL_PORTAL_PROCESSES workers and restarts any that exit while the
+    # server is running, backing off when a worker keeps crashing right after start.
+    def __init__(self, processes, address, reuse_port):
+        self.processes = max(1, processes)
+        self.address = address
+        self.reuse_port = reuse_port
+        self.listen_socket = None
+        self.workers = {}
+        self.started = {}
+        self.backoff = {}
+        self.restart_at = {}
+        self.stopping = False
+        self.restarts = 0
+
+    def spawn(self, index):
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(index, self.address, self.listen_socket)
+            except BaseException as e:
+                if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                    print(f"[worker {index}] crashed: {e!r}")
+                    code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.workers[pid] = index
+        self.started[index] = time.monotonic()
+        self.restart_at.pop(index, None)
+
+    def request_stop(self, signum, frame):
+        self.stopping = True
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - self.started[index] < 5:
+                self.backoff[index] = min(SUPERVISOR_MAX_BACKOFF_SECONDS, max(1, self.backoff.get(index, 0) * 2))
+            else:
+                self.backoff[index] = 0
+            self.restarts += 1
+            self.restart_at[index] = time.monotonic() + self.backoff[index]
+            print(f"[supervisor] worker {index} (pid {pid}) exited with code {code}, restarting in {self.backoff[index]}s")
+
+    def stop_workers(self):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+        deadline = time.monotonic() + max(0, SHUTDOWN_GRACE_SECONDS) + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            print(f"[supervisor] worker pid {pid} did not stop in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    def run(self):
+        if self.reuse_port:
+            open_listen_socket(self.address, True).close()
+        else:
+            self.listen_socket = open_listen_socket(self.address, False)
+        if RESPONSE_CACHE is not None and RESPONSE_CACHE.disk is not None:
+            RESPONSE_CACHE.disk.close()
+        SHARED_STATE.reset()
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        for index in range(self.processes):
+            self.spawn(index)
+        while not self.stopping:
+            time.sleep(0.5)
+            self.reap()
+            now = time.monotonic()
+            for index, restart_at in list(self.restart_at.items()):
+                if now >= restart_at and not self.stopping:
+                    self.spawn(index)
+        print("\nShutdown requested, stopping workers...")
+        self.stop_workers()
+        if self.listen_socket is not None:
+            self.listen_socket.close()
+
+
+def install_shutdown_signal(httpd):
+    def request_shutdown(signum, frame):
+        print("\nShutdown requested, draining in-flight requests...")
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    try:
+        signal.signal(signal.SIGTERM, request_shutdown)
+    except (ValueError, AttributeError):
+        pass
+
 
 def get_local_ip():
     try:
@@ -511,6 +4549,8 @@ if __name__ == "__main__":
         print("Warning: Dist directory not found. Static file serving disabled.")
         print("Proxy mode is still active.")
         DIST_DIR = "."
+    elif STATIC_INDEX_ENABLED:
+        STATIC_INDEX = build_static_index(DIST_DIR)
 
     internal_ip = get_local_ip()
     print("\n--- Social Portal Portable Server ---")
@@ -519,11 +4559,40 @@ if __name__ == "__main__":
     print(f"Network: http://{internal_ip}:{PORT}")
     print(f"Nitter bridge: {'enabled' if NITTER_ENABLED else 'disabled'} ({len(NITTER_SOURCES)} sources)")
     print(f"Redlib bridge: {'enabled' if REDLIB_ENABLED else 'disabled'} ({len(REDLIB_SOURCES)} sources)")
-    print(f"Bridge limits: {MAX_DIRECT_SOURCE_ATTEMPTS} direct + {MAX_PROXY_FALLBACK_ATTEMPTS} proxy attempts")
+    print(f"Bridge limits: {MAX_DIRECT_SOURCE_ATTEMPTS} direct + {MAX_PROXY_FALLBACK_ATTEMPTS} proxy attempts" + (f" within {BRIDGE_DEADLINE_MS} ms ({round(BRIDGE_DIRECT_SHARE * 100)}% direct)" if BRIDGE_DEADLINE_MS > 0 else ""))
+    if ADAPTIVE_TIMEOUTS_ENABLED:
+        print(f"Adaptive source timeouts: p99 x {ADAPTIVE_TIMEOUT_FACTOR:g}, floor {ADAPTIVE_TIMEOUT_FLOOR_MS} ms, after {ADAPTIVE_TIMEOUT_MIN_SAMPLES} samples")
+    print(f"Response cache: {'enabled' if RESPONSE_CACHE else 'disabled'} ({CACHE_MAX_BYTES // (1024 * 1024)} MB, {CACHE_STALE_SECONDS}s stale window)")
+    if RESPONSE_CACHE is not None and RESPONSE_CACHE.disk is not None:
+        print(f"Disk cache: {DISK_CACHE_PATH} ({DISK_CACHE_MAX_BYTES // (1024 * 1024)} MB, {DISK_CACHE_MAX_AGE_SECONDS}s max age)")
+    print(f"Upstream pool: {'enabled' if UPSTREAM_POOL else 'disabled'} ({UPSTREAM_POOL_MAX_PER_HOST} idle per host, {UPSTREAM_POOL_IDLE_SECONDS}s idle timeout)")
+    if UPSTREAM_LIMITER is not None:
+        print(f"Upstream limits: {UPSTREAM_MAX_IN_FLIGHT} in flight, {UPSTREAM_RATE_PER_SECOND:g} req/s per host ({len(UPSTREAM_HOST_LIMITS)} host overrides, queue {UPSTREAM_QUEUE_SIZE}, {UPSTREAM_QUEUE_TIMEOUT_MS} ms wait)")
+    if FEED_ENABLED:
+        overrides = "".join(f", {name} {deadline_ms} ms" for name, deadline_ms in FEED_NETWORK_DEADLINES_MS.items())
+        print(f"Unified feed: /api/feed ({', '.join(FEED_DEFAULT_NETWORKS)}; {FEED_NETWORK_DEADLINE_MS} ms deadline per network{overrides})")
+    if METRICS is not None:
+        print(f"Metrics: /api/metrics (Server-Timing headers {'on' if SERVER_TIMING_ENABLED else 'off'})")
+    if CACHE_WARMER is not None:
+        print(f"Cache warming: top {PREFETCH_TOP_KEYS} hot routes + {len(PREFETCH_PATHS)} configured, every ~{PREFETCH_INTERVAL_SECONDS}s, paused after {PREFETCH_IDLE_SECONDS}s idle")
+    if HEALTH_MONITOR is not None:
+        print(f"Health monitor: every {HEALTH_INTERVAL_SECONDS}s (±{round(HEALTH_INTERVAL_JITTER * 100)}% jitter, paused after {HEALTH_IDLE_SECONDS}s without requests)")
+    if STREAMING_ENABLED:
+        print(f"Streaming proxy: enabled ({VALIDATION_PREFIX_BYTES // 1024} KB validation prefix)")
+    if SERVER_MODE == "pool":
+        print(f"Server mode: pool ({SERVER_WORKERS} workers, accept queue {SERVER_ACCEPT_QUEUE})")
+    else:
+        print(f"Server mode: {SERVER_MODE}")
+    if MULTIPROCESS_ENABLED:
+        print(f"Processes: {SERVER_PROCESSES} workers ({'SO_REUSEPORT' if REUSE_PORT_ENABLED else 'shared listening socket'}), shared state in {SHARED_STATE_PATH}")
+        if RESPONSE_CACHE is None or RESPONSE_CACHE.disk is None:
+            print("Warning: disk cache is off, so cached responses are not shared between workers.")
+    elif SERVER_PROCESSES > 1:
+        print("Warning: os.fork is unavailable on this platform, running a single process.")
     print("-------------------------------------\n")
 
-    with socketserver.TCPServer(("0.0.0.0", PORT), SPAHandler) as httpd:
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nShutting down.")
+    if MULTIPROCESS_ENABLED:
+        WorkerSupervisor(SERVER_PROCESSES, ("0.0.0.0", PORT), REUSE_PORT_ENABLED).run()
+    else:
+        serve(("0.0.0.0", PORT))
+    print("Server stopped.")